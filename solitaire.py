@@ -1,75 +1,115 @@
 """
 Solitaire clone.
 """
-from typing import Optional
+import time
+
+# Taken before the imports below, which are most of startup, for the startup report
+STARTUP_START = time.perf_counter()
 
+from collections import deque
+from typing import List, Optional
+
+import argparse
+import math
+import os
 import random
+import threading
 import arcade
-import time
-import pyglet
 
-# Screen title and size
-SCREEN_WIDTH = 1024
-SCREEN_HEIGHT = 768
-SCREEN_TITLE = "Solitaire"
+from solitaire_core import (
+    CARD_VALUES, CARD_SUITS, CARD_COUNT, PILE_COUNT, BOTTOM_FACE_DOWN_PILE, BOTTOM_FACE_UP_PILE,
+    PLAY_PILE_1, PLAY_PILE_7, DRAW, RECYCLE, FLIP, MOVE, RANK, COLOR, BLACK, RED, SEED_LIMIT, Klondike,
+    make_card,
+)
+from solitaire_animation import Tweens
+from solitaire_audio import TrackManager
+from solitaire_profile import FrameProfiler, NullProfiler, StartupReport
+from solitaire_replay import MoveLog, undo_source
+from solitaire_snapshot import Snapshot, load_snapshot
+from solitaire_hud import Hud
+from solitaire_layout import (
+    SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, CARD_SCALE, MAT_WIDTH, MAT_HEIGHT, TableLayout,
+)
 
-# Constants for sizing
-CARD_SCALE = 0.6
+# How long the hint key may spend looking for a way to win, in seconds
+HINT_TIME_BUDGET = 1.0
 
-# How big are the cards?
-CARD_WIDTH = 140 * CARD_SCALE
-CARD_HEIGHT = 190 * CARD_SCALE
+# Where the game in progress is kept, so it carries on next time
+SAVE_FILE = "solitaire.sav"
 
-# How big is the mat we'll place the card on?
-MAT_PERCENT_OVERSIZE = 1.25
-MAT_HEIGHT = int(CARD_HEIGHT * MAT_PERCENT_OVERSIZE)
-MAT_WIDTH = int(CARD_WIDTH * MAT_PERCENT_OVERSIZE)
+# Where the P key writes a trace of recent frames, with --profile
+TRACE_FILE = "solitaire-trace.json"
 
-# How much space do we leave as a gap between the mats?
-# Done as a percent of the mat size.
-VERTICAL_MARGIN_PERCENT = 0.10
-HORIZONTAL_MARGIN_PERCENT = 0.10
+# Seconds between refreshes of the profile overlay
+PROFILE_OVERLAY_INTERVAL = 0.5
 
-# The Y of the bottom row (2 piles)
-BOTTOM_Y = MAT_HEIGHT / 2 + MAT_HEIGHT * VERTICAL_MARGIN_PERCENT
+# Where the S key saves replay files
+REPLAY_DIRECTORY = "replays"
 
-# The X of where to start putting things on the left side
-START_X = MAT_WIDTH / 2 + MAT_WIDTH * HORIZONTAL_MARGIN_PERCENT
+# Longest gap between the clicks of a double-click, in seconds
+DOUBLE_CLICK_TIME = 0.3
 
-# The Y of the top row (4 piles)
-TOP_Y = SCREEN_HEIGHT - MAT_HEIGHT / 2 - MAT_HEIGHT * VERTICAL_MARGIN_PERCENT
+# Seconds the end game takes to play out, however many moves it has left
+AUTO_FINISH_TIME = 1.0
 
-# The Y of the middle row (7 piles)
-MIDDLE_Y = TOP_Y - MAT_HEIGHT - MAT_HEIGHT * VERTICAL_MARGIN_PERCENT
+# Face down image
+FACE_DOWN_IMAGE = ":resources:images/cards/cardBack_red2.png"
 
-# How far apart each pile goes
-X_SPACING = MAT_WIDTH + MAT_WIDTH * HORIZONTAL_MARGIN_PERCENT
+# Size of the window's texture atlas: room for every card from the start,
+# so it never has to grow (and copy itself) while the first deal goes in
+CARD_ATLAS_SIZE = 2048, 1024
 
-# Card constants
-CARD_VALUES = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
-CARD_SUITS = ["Clubs", "Hearts", "Spades", "Diamonds"]
 
-# If we fan our cards stacked on each other, how far apart to fan them?
-CARD_VERTICAL_OFFSET = CARD_HEIGHT * CARD_SCALE * 0.3
+class CardTextures:
+    """
+    The card back and all 52 faces, loaded once and shared by every card so
+    that flipping a card only swaps which texture it points at.
+    """
 
-# Face down image
-FACE_DOWN_IMAGE = ":resources:images/cards/cardBack_red2.png"
+    def __init__(self):
+        self.back: Optional[arcade.Texture] = None
+        # Face textures keyed by (suit, value)
+        self.faces = {}
+        # Thread loading them in the background, and how long that took
+        self.thread: Optional[threading.Thread] = None
+        self.load_time = None
+
+    @property
+    def ready(self):
+        """ Is every texture loaded? """
+        return self.back is not None and len(self.faces) == CARD_COUNT
+
+    def load_in_background(self):
+        """ Start loading the textures on a thread, unless that's already done or going """
+        if self.ready or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._background_load, daemon=True)
+        self.thread.start()
+
+    def _background_load(self):
+        self.load_time = self.load()
 
-# Constants that represent "what pile is what" for the game
-PILE_COUNT = 13
-BOTTOM_FACE_DOWN_PILE = 0
-BOTTOM_FACE_UP_PILE = 1
-PLAY_PILE_1 = 2
-PLAY_PILE_2 = 3
-PLAY_PILE_3 = 4
-PLAY_PILE_4 = 5
-PLAY_PILE_5 = 6
-PLAY_PILE_6 = 7
-PLAY_PILE_7 = 8
-TOP_PILE_1 = 9
-TOP_PILE_2 = 10
-TOP_PILE_3 = 11
-TOP_PILE_4 = 12
+    def load(self):
+        """ Load every texture that isn't loaded yet. Returns seconds taken. """
+        start = time.perf_counter()
+        # Anything being loaded in the background is waited for, not loaded twice
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        if self.back is None:
+            self.back = arcade.load_texture(FACE_DOWN_IMAGE)
+        for suit in CARD_SUITS:
+            for value in CARD_VALUES:
+                if (suit, value) not in self.faces:
+                    self.faces[suit, value] = arcade.load_texture(f":resources:images/cards/card{suit}{value}.png")
+        return time.perf_counter() - start
+
+    def all(self):
+        """ Every texture, back first """
+        return [self.back, *self.faces.values()]
+
+
+# Shared by all cards
+CARD_TEXTURES = CardTextures()
 
 
 class Card(arcade.Sprite):
@@ -82,25 +122,33 @@ class Card(arcade.Sprite):
         self.suit = suit
         self.value = value
 
-        # Image to use for the sprite when face up
-        self.image_file_name = f":resources:images/cards/card{self.suit}{self.value}.png"
+        # Card number used by the game model, its rank index and its colour
+        # (Sprite.color is the tint, so this one is card_color)
+        self.code = make_card(CARD_SUITS.index(suit), CARD_VALUES.index(value))
+        self.rank = RANK[self.code]
+        self.card_color = COLOR[self.code]
+
+        # Textures to use for the sprite when face up and face down. Whoever
+        # deals the cards has loaded CARD_TEXTURES already.
+        self.face_up_texture = CARD_TEXTURES.faces[suit, value]
+        self.face_down_texture = CARD_TEXTURES.back
         self.is_face_up = False
-        super().__init__(FACE_DOWN_IMAGE, scale, hit_box_algorithm="None")
+        super().__init__(scale=scale, hit_box_algorithm="None", texture=self.face_down_texture)
 
     def is_black(self):
-        return self.suit in ["Spades", "Clubs"]
+        return self.card_color == BLACK
 
     def is_red(self):
-        return self.suit in ["Hearts", "Diamonds"]
+        return self.card_color == RED
 
     def face_down(self):
         """ Turn card face-down """
-        self.texture = arcade.load_texture(FACE_DOWN_IMAGE)
+        self.texture = self.face_down_texture
         self.is_face_up = False
 
     def face_up(self):
         """ Turn card face-up """
-        self.texture = arcade.load_texture(self.image_file_name)
+        self.texture = self.face_up_texture
         self.is_face_up = True
 
     @property
@@ -112,27 +160,77 @@ class Card(arcade.Sprite):
 class MyGame(arcade.Window):
     """ Main application class. """
 
-    def __init__(self):
-        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+    def __init__(self, visible=True, music=True, save_path=None, profile=False):
+        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, visible=visible)
+
+        # The atlas is made the first time a sprite list draws, so this is in time
+        self.ctx.atlas_size = CARD_ATLAS_SIZE
 
-        # Sprite list with all the cards, no matter what pile they are in.
-        self.card_list: Optional[arcade.SpriteList] = None
+        # One sprite list per pile, holding its cards bottom first. Piles are
+        # drawn in order, so a card's draw order comes from where it sits.
+        # None of them until the first deal.
+        self.pile_sprites: List[arcade.SpriteList] = []
 
         self.background_color = arcade.color.AMAZON
         self.random_color = False
 
         # List of cards we are dragging with the mouse
-        self.held_cards = None
+        self.held_cards = []
 
         # Original location of cards we are dragging with the mouse in case
         # they have to go back.
-        self.held_cards_original_position = None
+        self.held_cards_original_position = []
+
+        # Pile the held cards came from. They're the top of it, so drawing
+        # that pile last puts them over everything else.
+        self.held_pile = None
+
+        # Piles the held cards may legally go to, and the one they're over
+        self.legal_targets = set()
+        self.hover_pile = None
+
+        # Card number and time of the last click on a face-up card, to spot double-clicks
+        self.last_click = (None, 0.0)
+
+        # End game moves still to play, how many there were, and how long it's been going
+        self.finish_queue = deque()
+        self.finish_count = 0
+        self.finish_elapsed = 0.0
+
+        # Sprite list with all the mats tha cards lay on. They never change,
+        # so they're made once and there's a table to show from the first frame.
+        self.pile_mat_list: arcade.SpriteList = arcade.SpriteList()
 
-        # Sprite list with all the mats tha cards lay on.
-        self.pile_mat_list = None
+        # Text over the table: timer, hint, banner and help
+        self.hud = Hud()
 
-        # Create a list of lists, each holds a pile of cards.
-        self.piles = None
+        # Timings of the hot paths, only recorded when asked for
+        self.profiler = FrameProfiler() if profile else NullProfiler()
+        self.profile_overlay_due = 0.0
+
+        # Where everything on the table goes, and what is under the mouse
+        self.layout = TableLayout()
+
+        # Create a mat for each pile, in pile order
+        for pile_index in range(PILE_COUNT):
+            pile = arcade.SpriteSolidColor(MAT_WIDTH, MAT_HEIGHT, arcade.csscolor.DARK_OLIVE_GREEN)
+            pile.position = self.layout.pile_positions[pile_index]
+            self.pile_mat_list.append(pile)
+
+        # Headless game model holding the piles as card numbers.
+        self.game = Klondike()
+
+        # Every move made in this deal, for undo, redo and replay files
+        self.log = MoveLog()
+
+        # Save file kept up to date as the game is played, if there is one
+        self.snapshot: Optional[Snapshot] = Snapshot(save_path) if save_path else None
+
+        # Card sprites, indexed by card number.
+        self.cards = None
+
+        # Cards on their way to where the game model has put them
+        self.tweens = Tweens()
 
         # Initialize the main game timer
         self.start_time = time.time()
@@ -147,16 +245,70 @@ class MyGame(arcade.Window):
         # Variable to track if the player has lost
         self.has_lost = False
 
-        # Load the first background music track
+        # Hint from the solver: the move to show and its description. The
+        # solver runs on a thread and leaves (state key, result) here.
+        self.hint_move = None
+        self.hint_text = ""
+        self.hint_result = None
+        self.hint_thread: Optional[threading.Thread] = None
+
+        # Background music playlist. Tracks that aren't there get dropped at
+        # startup, and benchmarks run without music at all.
         self.background_music_tracks = ["musics/red.mp3", "musics/blue.mp3", "musics/bys.mp3", "musics/red.mp3",
                                         "musics/22.mp3", "musics/die_for_you.mp3", "musics/dissolve.mp3",
                                         "musics/drunk.mp3", "musics/glimpse_of_us.mp3", "musics/just_friend.mp3",
                                         "musics/starlight.mp3", "musics/start_music.mp3", "musics/what_am_i.mp3"]
-        self.current_track_index = 0
-        self.background_music_player = None
+        self.music: Optional[TrackManager] = TrackManager(self.background_music_tracks) if music else None
+
+        # The music starts after the first frame, so opening the audio device
+        # doesn't hold it up
+        self.music_started = False
+        self.first_frame_drawn = False
 
-    def setup(self):
-        """ Set up the game here. Call this function to restart the game. """
+        # Deal waiting for the card textures, as (seed, saved game), and
+        # the report of how long startup took, if it's being timed
+        self.pending_start = None
+        self.startup: Optional[StartupReport] = None
+        self.startup_report_path = None
+
+    def start(self, seed=None, saved=None):
+        """
+        Start up without waiting for the card textures: frames show the empty
+        table while they load on a thread, and the game is set up when they're in.
+        """
+        self.pending_start = (seed, saved)
+        CARD_TEXTURES.load_in_background()
+
+    def finish_start(self):
+        """ The card textures are in, so deal the first game """
+        seed, saved = self.pending_start
+        self.pending_start = None
+        if self.startup:
+            self.startup.mark("texture wait")
+        self.setup(seed, saved)
+        if self.startup:
+            self.startup.mark("deal")
+            self.startup.mark("texture thread", CARD_TEXTURES.load_time or 0.0)
+            if self.first_frame_drawn:
+                self.report_startup()
+
+    def report_startup(self):
+        """
+        Startup is over once there's been a frame and a deal. Print how long
+        it took, and save it and quit if that's all that was asked for.
+        """
+        print("Startup:")
+        for line in self.startup.lines():
+            print(f"  {line}")
+        if self.startup_report_path:
+            self.startup.save(self.startup_report_path)
+            self.close()
+
+    def setup(self, seed=None, saved=None):
+        """
+        Set up the game here. Call this function to restart the game. Picks up
+        a SavedGame if it's still going, else deals game seed, or a random one.
+        """
 
         # List of cards we are dragging with the mouse
         self.held_cards = []
@@ -164,382 +316,604 @@ class MyGame(arcade.Window):
         # Original location of cards we are dragging with the mouse in case
         # they have to go back.
         self.held_cards_original_position = []
+        self.held_pile = None
+        self.legal_targets = set()
+        self.hover_pile = None
+        self.last_click = (None, 0.0)
+        self.finish_queue.clear()
 
-        # ---  Create the mats the cards go on.
+        # A new game hasn't been won or lost yet
+        self.has_won = False
+        self.has_lost = False
+        self.clear_hint()
 
-        # Sprite list with all the mats tha cards lay on.
-        self.pile_mat_list: arcade.SpriteList = arcade.SpriteList()
+        # --- Create, shuffle, and deal the cards
 
-        # Create the mats for the bottom face down and face up piles
-        pile = arcade.SpriteSolidColor(MAT_WIDTH, MAT_HEIGHT, arcade.csscolor.DARK_OLIVE_GREEN)
-        pile.position = START_X, BOTTOM_Y
-        self.pile_mat_list.append(pile)
+        # Create every card
+        CARD_TEXTURES.load()
+        self.cards = [Card(card_suit, card_value, CARD_SCALE)
+                      for card_suit in CARD_SUITS for card_value in CARD_VALUES]
+
+        # Lay out the saved game, unless it's already over
+        if saved is not None:
+            self.game.set_piles(saved.piles, saved.face_up)
+            self.game.seed = saved.seed
+            self.log.load(saved.seed, saved.records)
+            if self.game.is_won() or saved.elapsed >= self.default_time_limit_1:
+                saved = None
+            else:
+                self.start_time = time.time() - saved.elapsed
+                if self.music and self.music.tracks:
+                    self.music.index = saved.track % len(self.music.tracks)
+
+        # Otherwise shuffle and deal the cards in the game model, and start the clock
+        if saved is None:
+            self.game.deal(seed)
+            self.log.clear(self.game.seed)
+            self.start_time = time.time()
 
-        pile = arcade.SpriteSolidColor(MAT_WIDTH, MAT_HEIGHT, arcade.csscolor.DARK_OLIVE_GREEN)
-        pile.position = START_X + X_SPACING, BOTTOM_Y
-        self.pile_mat_list.append(pile)
+        # Write the whole game to the save file, and then each move as it's made
+        if self.snapshot:
+            self.snapshot.start(self.game, self.log, 0.0 if saved is None else saved.elapsed, self.track_index)
 
-        # Create the seven middle piles
-        for i in range(7):
-            pile = arcade.SpriteSolidColor(MAT_WIDTH, MAT_HEIGHT, arcade.csscolor.DARK_OLIVE_GREEN)
-            pile.position = START_X + i * X_SPACING, MIDDLE_Y
-            self.pile_mat_list.append(pile)
+        self.build_pile_sprites()
 
-        # Create the top "play" piles
-        for i in range(4):
-            pile = arcade.SpriteSolidColor(MAT_WIDTH, MAT_HEIGHT, arcade.csscolor.DARK_OLIVE_GREEN)
-            pile.position = START_X + i * X_SPACING, TOP_Y
-            self.pile_mat_list.append(pile)
-
-        # --- Create, shuffle, and deal the cards
+        # A new deal is dealt out from the stock; a saved game is just there
+        if saved is None:
+            self.animate_deal()
 
-        # Sprite list with all the cards, no matter what pile they are in.
-        self.card_list = arcade.SpriteList()
+        # Show which deal this is, so it can be played again
+        self.hud.set_text(self.hud.deal, f"Deal {self.game.seed}")
 
-        # Create every card
-        for card_suit in CARD_SUITS:
-            for card_value in CARD_VALUES:
-                card = Card(card_suit, card_value, CARD_SCALE)
-                card.position = START_X, BOTTOM_Y
-                self.card_list.append(card)
-
-        # Shuffle the cards
-        for pos1 in range(len(self.card_list)):
-            pos2 = random.randrange(len(self.card_list))
-            self.card_list.swap(pos1, pos2)
-
-        # Create a list of lists, each holds a pile of cards.
-        self.piles = [[] for _ in range(PILE_COUNT)]
-
-        # Put all the cards in the bottom face-down pile
-        for card in self.card_list:
-            self.piles[BOTTOM_FACE_DOWN_PILE].append(card)
-
-        # - Pull from that pile into the middle piles, all face-down
-        # Loop for each pile
-        for pile_no in range(PLAY_PILE_1, PLAY_PILE_7 + 1):
-            # Deal proper number of cards for that pile
-            for j in range(pile_no - PLAY_PILE_1 + 1):
-                # Pop the card off the deck we are dealing from
-                card = self.piles[BOTTOM_FACE_DOWN_PILE].pop()
-                # Put in the proper pile
-                self.piles[pile_no].append(card)
-                # Move card to same position as pile we just put it in
-                card.position = self.pile_mat_list[pile_no].position
-                # Put on top in draw order
-                self.pull_to_top(card)
-
-        # Flip up the top cards
-        for i in range(PLAY_PILE_1, PLAY_PILE_7 + 1):
-            self.piles[i][-1].face_up()
-
-        # Start playing the first track
-        self.play_track(self.current_track_index)
-
-    def play_track(self, track_index):
-        if self.background_music_player:
-            self.background_music_player.delete()
-
-        # Load and play the track, with looping behavior
-        track = pyglet.media.load(self.background_music_tracks[track_index], streaming=False)
-        self.background_music_player = pyglet.media.Player()
-        self.background_music_player.queue(track)
-        self.background_music_player.loop = True  # Set looping behavior
-        self.background_music_player.play()
+        # Start playing the current track from the beginning, if the music's on yet
+        if self.music and self.music_started:
+            self.music.play(self.music.index)
 
     def on_draw(self):
         """ Render the screen. """
-        # Clear the screen
-        self.clear()
-
-        # Draw the mats the cards go on to
-        self.pile_mat_list.draw()
-
-        # Draw the cards
-        self.card_list.draw()
-
-        # Check if the player has won or lost and display the message
-        if self.has_won:
-            arcade.draw_text("You won the game!", SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, arcade.color.BLACK, 36,
-                             anchor_x="center")
-        elif self.has_lost:
-            arcade.draw_text("You ran out of time and lost!", SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, arcade.color.BLACK,
-                             36,
-                             anchor_x="center")
-
-        if self.default_time_limit_1:
-            # Display the remaining time in the top-right corner
-            remaining_time = max(0, self.default_time_limit_1 - int(self.elapsed_time))
-            minutes = remaining_time // 60
-            seconds = remaining_time % 60
-            time_text = f"Time: {minutes:02}:{seconds:02}"
-            arcade.draw_text(time_text, SCREEN_WIDTH - 10, SCREEN_HEIGHT - 30, arcade.color.WHITE, 18, anchor_x="right")
-
-        arcade.draw_text("'R': restart the game, 'Space': skip the music", SCREEN_WIDTH - 5, SCREEN_HEIGHT - 720,
-                         arcade.color.WHITE, 18, anchor_x="right")
-        arcade.draw_text("'D': turn on/off music, 'C': change background color", SCREEN_WIDTH - 5,
-                         SCREEN_HEIGHT - 750, arcade.color.WHITE, 18, anchor_x="right")
-
-    def pull_to_top(self, card: arcade.Sprite):
-        """ Pull card to top of rendering order (last to render, looks on-top) """
-
-        # Remove, and append to the end
-        self.card_list.remove(card)
-        self.card_list.append(card)
+        with self.profiler.section("draw"):
+            # Clear the screen
+            self.clear()
+
+            # Draw the mats the cards go on to
+            self.pile_mat_list.draw()
+
+            # Outline where the held cards could go
+            self.draw_legal_targets()
+
+            # Draw the cards, then the ones on their way somewhere over them
+            self.draw_cards()
+            self.tweens.draw()
+
+            # Outline the card the hint is about
+            if self.hint_move is not None and self.hint_move[1] >= 0:
+                card = self.cards[self.hint_move[1]]
+                arcade.draw_rectangle_outline(card.center_x, card.center_y, card.width, card.height,
+                                              arcade.color.YELLOW, 3)
+
+            # Check if the player has won or lost and display the message
+            if self.has_won:
+                self.hud.set_text(self.hud.banner, "You won the game!")
+            elif self.has_lost:
+                self.hud.set_text(self.hud.banner, "You ran out of time and lost!")
+            else:
+                self.hud.set_text(self.hud.banner, "")
+
+            if self.default_time_limit_1:
+                # Display the remaining time in the top-right corner
+                self.hud.show_time(max(0, self.default_time_limit_1 - int(self.elapsed_time)))
+
+            self.hud.set_text(self.hud.hint, self.hint_text)
+
+            # Labels only lay out again when their text changed above
+            self.hud.draw()
+
+        self.profiler.end_frame()
+
+        if not self.first_frame_drawn:
+            self.first_frame_drawn = True
+            if self.startup:
+                self.startup.mark("first frame")
+                if self.pending_start is None:
+                    self.report_startup()
+
+    @property
+    def track_index(self):
+        """ Playlist position of the music, for the save file """
+        return self.music.index if self.music else 0
+
+    def save_moved(self, codes):
+        """ A move changed these cards; write them and the log to the save file """
+        if self.snapshot:
+            self.snapshot.update(self.game, self.log, codes)
+
+    def on_close(self):
+        """ Make sure the save file is on disk before the window goes """
+        if self.snapshot:
+            self.snapshot.close()
+            self.snapshot = None
+        super().on_close()
+
+    def draw_legal_targets(self):
+        """ Outline the top card or mat of each pile the held cards can go on """
+        for pile_index in self.legal_targets:
+            pile = self.game.piles[pile_index]
+            x, y = self.layout.card_position(pile_index, max(len(pile) - 1, 0))
+            if pile_index == self.hover_pile:
+                arcade.draw_rectangle_outline(x, y, MAT_WIDTH, MAT_HEIGHT, arcade.color.YELLOW_GREEN, 4)
+            else:
+                arcade.draw_rectangle_outline(x, y, MAT_WIDTH, MAT_HEIGHT, arcade.color.LIGHT_GREEN, 2)
+
+    def draw_cards(self):
+        """ Draw every pile's cards, with the pile being dragged from on top """
+        for pile_index, sprites in enumerate(self.pile_sprites):
+            if pile_index != self.held_pile:
+                sprites.draw()
+        if self.held_pile is not None:
+            self.pile_sprites[self.held_pile].draw()
+
+    def build_pile_sprites(self):
+        """ Put every card sprite in its pile's sprite list, in place, from the game model """
+        self.tweens.reset(self.cards)
+        self.pile_sprites = [arcade.SpriteList() for _ in range(PILE_COUNT)]
+        # Put every card texture in the atlas up front so flips never upload.
+        # All the lists share the window's atlas.
+        self.pile_sprites[BOTTOM_FACE_DOWN_PILE].preload_textures(CARD_TEXTURES.all())
+
+        for pile_no, pile in enumerate(self.game.piles):
+            for depth, code in enumerate(pile):
+                card = self.cards[code]
+                card.position = self.layout.card_position(pile_no, depth)
+                if self.game.is_face_up(code):
+                    card.face_up()
+                else:
+                    card.face_down()
+                self.pile_sprites[pile_no].append(card)
+
+    def animate_deal(self):
+        """ Send the play piles' cards out from the stock, a card to each pile in turn """
+        stock_position = self.layout.card_position(BOTTOM_FACE_DOWN_PILE, 0)
+        piles = self.game.piles
+        for depth in range(PLAY_PILE_7 - PLAY_PILE_1 + 1):
+            for pile_index in range(PLAY_PILE_1 + depth, PLAY_PILE_7 + 1):
+                code = piles[pile_index][depth]
+                card = self.cards[code]
+                card.face_down()
+                card.position = stock_position
+                self.slide_card(code)
+
+    def slide_card(self, code):
+        """ Animate a card to its place and face in the game model """
+        self.tweens.move(code, *self.layout.card_position(self.game.pile_of[code], self.game.depth_of[code]),
+                         face_up=self.game.is_face_up(code))
+
+    def move_sprites(self, codes, from_pile, to_pile):
+        """
+        The game model just moved cards off the top of one pile onto another,
+        in the order given. Do the same with their sprites.
+        """
+        source = self.pile_sprites[from_pile]
+        target = self.pile_sprites[to_pile]
+        for _ in codes:
+            source.pop()
+        for code in codes:
+            target.append(self.cards[code])
+
+    def clear_hint(self):
+        """ Forget the hint, the game has moved on """
+        self.hint_move = None
+        self.hint_text = ""
+
+    def request_hint(self):
+        """ Start the solver on the current game, unless it's already running """
+        if self.hint_thread and self.hint_thread.is_alive():
+            return
+        # The solver is only needed once a hint is asked for, so it's imported then
+        from solitaire_solver import Solver, state_key
+        game = self.game.copy()
+        self.hint_text = "Thinking..."
+
+        def solve():
+            self.hint_result = state_key(game), Solver(HINT_TIME_BUDGET).solve(game)
+
+        self.hint_thread = threading.Thread(target=solve, daemon=True)
+        self.hint_thread.start()
+
+    def show_hint(self):
+        """ Show a finished solver result, if it's still about the current game """
+        from solitaire_solver import WON, LOST, describe_move, state_key
+        key, result = self.hint_result
+        self.hint_result = None
+        if key != state_key(self.game):
+            return
+        if result.status == WON:
+            self.hint_move = result.moves[0]
+            self.hint_text = f"Hint: {describe_move(self.hint_move)}"
+        elif result.status == LOST:
+            self.hint_text = "No way to win from here"
+        else:
+            self.hint_text = "No hint found in time"
 
     def on_key_press(self, symbol: int, modifiers: int):
         """ User presses key """
+        # Nothing to play until the first deal is in
+        if self.pending_start is not None:
+            return
+        if symbol == arcade.key.H:
+            # Ask the solver for the next move
+            self.request_hint()
         if symbol == arcade.key.R:
-            # Restart
+            # Restart, with the timer
             self.setup()
-            # Restart the selected timer
-            self.start_time = time.time()
         if symbol == arcade.key.SPACE:
             # Skip to the next track when the space bar is pressed
-            self.current_track_index = (self.current_track_index + 1) % len(self.background_music_tracks)
-            self.play_track(self.current_track_index)
+            if self.music:
+                self.music.skip()
         if symbol == arcade.key.C:
             # Change the background color to a random color
             self.background_color = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
         if symbol == arcade.key.D:
             # Toggle background music on/off when the "D" key is pressed
-            if self.background_music_player:
-                if self.background_music_player.playing:
-                    self.background_music_player.pause()
-                else:
-                    self.background_music_player.play()
+            if self.music:
+                self.music.toggle()
+        if symbol == arcade.key.Z:
+            # Take back the last move
+            self.undo()
+        if symbol == arcade.key.Y:
+            # Make the last undone move again
+            self.redo()
+        if symbol == arcade.key.F:
+            # Play out the end game, if every card is showing
+            self.start_finish()
+        if symbol == arcade.key.S:
+            # Save this game so far as a replay file
+            os.makedirs(REPLAY_DIRECTORY, exist_ok=True)
+            path = os.path.join(REPLAY_DIRECTORY, f"deal-{self.game.seed}.solr")
+            self.log.save(path)
+            print(f"Saved {self.log.position} moves to {path}")
+        if symbol == arcade.key.P and self.profiler.enabled:
+            # Write the recent frames out for chrome://tracing
+            events = self.profiler.dump_trace(TRACE_FILE)
+            print(f"Wrote {events} trace events to {TRACE_FILE}")
+
+    def undo(self):
+        """ Take back the last move, unless cards are being dragged or the end game is playing out """
+        if self.held_cards or self.finish_queue:
+            return
+        logged = self.log.undo(self.game)
+        if logged:
+            self.show_logged_move(*logged, undone=True)
 
-    def on_mouse_press(self, x, y, button, key_modifiers):
-        """ Called when the user presses a mouse button. """
+    def redo(self):
+        """ Make the last undone move again, unless cards are being dragged or the end game is playing out """
+        if self.held_cards or self.finish_queue:
+            return
+        logged = self.log.redo(self.game)
+        if logged:
+            self.show_logged_move(*logged, undone=False)
+
+    def play_move(self, move):
+        """ Make a move for the player, log it, and bring the sprites in step. Returns True if it was made. """
+        source = undo_source(self.game, move)
+        with self.profiler.section("rules"):
+            made = self.game.apply(move)
+        if made:
+            self.log.record(move, source)
+            self.show_logged_move(move, source, undone=False)
+        return made
+
+    def send_to_foundation(self, code):
+        """ Double-click: move a card straight up to its foundation, if it can go. Returns True if it went. """
+        with self.profiler.section("rules"):
+            pile_index = self.game.foundation_for(code)
+        if pile_index is None or not self.play_move((MOVE, code, pile_index)):
+            return False
+        self.offer_finish()
+        return True
+
+    def start_finish(self):
+        """ Work out the rest of the game and start playing it out. Returns True if it can be. """
+        if self.held_cards or self.finish_queue or self.has_won or not self.game.all_face_up():
+            return False
+        with self.profiler.section("rules"):
+            moves = self.game.finish_moves()
+        if not moves:
+            return False
+        self.finish_queue.extend(moves)
+        self.finish_count = len(moves)
+        self.finish_elapsed = 0.0
+        return True
+
+    def offer_finish(self):
+        """
+        After a move, play out the end game without being asked once there's
+        nothing left to choose: every card is face up and the stock is gone.
+        """
+        piles = self.game.piles
+        if len(piles[BOTTOM_FACE_DOWN_PILE]) == 0 and len(piles[BOTTOM_FACE_UP_PILE]) == 0:
+            self.start_finish()
 
-        # Get list of cards we've clicked on
-        cards = arcade.get_sprites_at_point((x, y), self.card_list)
-
-        # Have we clicked on a card?
-        if len(cards) > 0:
-
-            # Might be a stack of cards, get the top one
-            primary_card = cards[-1]
-            assert isinstance(primary_card, Card)
-
-            # Figure out what pile the card is in
-            pile_index = self.get_pile_for_card(primary_card)
-
-            # Are we clicking on the bottom deck, to flip three cards?
-            if pile_index == BOTTOM_FACE_DOWN_PILE:
-                # Flip three cards
-                for i in range(3):
-                    # If we ran out of cards, stop
-                    if len(self.piles[BOTTOM_FACE_DOWN_PILE]) == 0:
-                        break
-                    # Get top card
-                    card = self.piles[BOTTOM_FACE_DOWN_PILE][-1]
-                    # Flip face up
-                    card.face_up()
-                    # Move card position to bottom-right face up pile
-                    card.position = self.pile_mat_list[BOTTOM_FACE_UP_PILE].position
-                    # Remove card from face down pile
-                    self.piles[BOTTOM_FACE_DOWN_PILE].remove(card)
-                    # Move card to face up list
-                    self.piles[BOTTOM_FACE_UP_PILE].append(card)
-                    # Put on top draw-order wise
-                    self.pull_to_top(card)
-
-            elif primary_card.is_face_down:
-                # Is the card face down? In one of those middle 7 piles? Then flip up
-                primary_card.face_up()
+    def play_finish(self, delta_time):
+        """
+        Play the share of the end game that's due by now. Moves go in batches
+        spread over AUTO_FINISH_TIME, so it takes as long for five cards as fifty.
+        """
+        self.finish_elapsed += delta_time
+        due = min(self.finish_count, math.ceil(self.finish_count * self.finish_elapsed / AUTO_FINISH_TIME))
+        while self.finish_queue and self.finish_count - len(self.finish_queue) < due:
+            if not self.play_move(self.finish_queue.popleft()):
+                # The game isn't what the moves were worked out for
+                self.finish_queue.clear()
+
+    def show_logged_move(self, move, source, undone):
+        """ Bring the sprites in step after the log undid or redid a move """
+        kind, code, pile_index = move
+        if kind == FLIP:
+            codes = [code]
+        else:
+            if kind == DRAW:
+                from_pile, to_pile = BOTTOM_FACE_DOWN_PILE, BOTTOM_FACE_UP_PILE
+            elif kind == RECYCLE:
+                from_pile, to_pile = BOTTOM_FACE_UP_PILE, BOTTOM_FACE_DOWN_PILE
+            else:
+                from_pile, to_pile = source, pile_index
+            if undone:
+                from_pile, to_pile = to_pile, from_pile
+
+            # The moved cards are now on top of the pile they went to
+            landed = self.game.piles[to_pile]
+            if kind == DRAW:
+                codes = landed[-source:]
+            elif kind == RECYCLE:
+                codes = landed
             else:
-                # All other cases, grab the face-up card we are clicking on
-                self.held_cards = [primary_card]
-                # Save the position
-                self.held_cards_original_position = [self.held_cards[0].position]
-                # Put on top in drawing order
-                self.pull_to_top(self.held_cards[0])
-
-                # Is this a stack of cards? If so, grab the other cards too
-                card_index = self.piles[pile_index].index(primary_card)
-                for i in range(card_index + 1, len(self.piles[pile_index])):
-                    card = self.piles[pile_index][i]
-                    self.held_cards.append(card)
-                    self.held_cards_original_position.append(card.position)
-                    self.pull_to_top(card)
+                codes = landed[self.game.depth_of[code]:]
+            self.move_sprites(codes, from_pile, to_pile)
 
-        else:
-            # Click on a mat instead of a card?
-            mats = arcade.get_sprites_at_point((x, y), self.pile_mat_list)
-
-            if len(mats) > 0:
-                mat = mats[0]
-                mat_index = self.pile_mat_list.index(mat)
-
-                # Is it our turned over flip mat? and no cards on it?
-                if mat_index == BOTTOM_FACE_DOWN_PILE and len(self.piles[BOTTOM_FACE_DOWN_PILE]) == 0:
-                    # Flip the deck back over so we can restart
-                    temp_list = self.piles[BOTTOM_FACE_UP_PILE].copy()
-                    for card in reversed(temp_list):
-                        card.face_down()
-                        self.piles[BOTTOM_FACE_UP_PILE].remove(card)
-                        self.piles[BOTTOM_FACE_DOWN_PILE].append(card)
-                        card.position = self.pile_mat_list[BOTTOM_FACE_DOWN_PILE].position
-
-    def remove_card_from_pile(self, card):
-        """ Remove card from whatever pile it was in. """
-        for pile in self.piles:
-            if card in pile:
-                pile.remove(card)
-                break
+        for code in codes:
+            self.slide_card(code)
+
+        self.save_moved(codes)
+        self.clear_hint()
+        self.has_won = self.check_win_condition()
+
+    def on_mouse_press(self, x, y, button, key_modifiers):
+        """ Called when the user presses a mouse button. """
+        self.profiler.input_event()
+        with self.profiler.section("input"):
+            # Hands off until the first deal is in, and while the end game plays itself out
+            if self.pending_start is not None or self.finish_queue:
+                return
+
+            # Work out which pile, and which card in it, we've clicked on
+            with self.profiler.section("hit test"):
+                hit = self.layout.hit_test(x, y, self.game.piles)
+            if hit is None:
+                return
+            pile_index, depth = hit
+
+            # Have we clicked on a card?
+            if depth is not None:
+
+                # Might be a stack of cards, this is the top one under the mouse
+                primary_card = self.cards[self.game.piles[pile_index][depth]]
+
+                # Are we clicking on the bottom deck, to flip three cards?
+                if pile_index == BOTTOM_FACE_DOWN_PILE:
+                    self.clear_hint()
+                    # Flip three cards
+                    with self.profiler.section("rules"):
+                        drawn = self.game.draw_stock()
+                    self.log.record((DRAW, -1, BOTTOM_FACE_UP_PILE), len(drawn))
+                    self.save_moved(drawn)
+                    # Slide them over to the face up pile, turning them over
+                    for code in drawn:
+                        self.slide_card(code)
+                    # They land on top of the face up pile, draw-order wise too
+                    self.move_sprites(drawn, BOTTOM_FACE_DOWN_PILE, BOTTOM_FACE_UP_PILE)
+
+                elif not self.game.is_face_up(primary_card.code):
+                    # Is the card face down? On top of one of those middle 7 piles? Then flip up
+                    with self.profiler.section("rules"):
+                        flipped = self.game.flip(primary_card.code)
+                    if flipped:
+                        self.log.record((FLIP, primary_card.code, pile_index), 0)
+                        self.save_moved([primary_card.code])
+                        self.slide_card(primary_card.code)
+                        self.clear_hint()
+                        self.offer_finish()
+                elif not (self.is_double_click(primary_card.code) and self.send_to_foundation(primary_card.code)):
+                    # The second click of a double-click sends the card up to a
+                    # foundation. If it has nowhere to go, or for any other click,
+                    # grab the face-up card we are clicking on,
+                    # and if this is a stack of cards, the other cards too. Only
+                    # legal runs come up, and where they can go is worked out now;
+                    # nothing changes while they're held.
+                    with self.profiler.section("rules"):
+                        run = self.game.run_from(primary_card.code)
+                        if run:
+                            self.legal_targets = {target for kind, card, target in self.game.legal_moves()
+                                                  if kind == MOVE and card == primary_card.code}
+                    if run:
+                        # Anything still on its way gets there before it's picked up
+                        self.tweens.finish(run)
+                        self.held_cards = [self.cards[code] for code in run]
+                        # Save the position
+                        self.held_cards_original_position = [card.position for card in self.held_cards]
+                        # Their pile gets drawn last while they're held
+                        self.held_pile = pile_index
+
+            # Clicked on a mat instead of a card. Is it our turned over flip mat?
+            elif pile_index == BOTTOM_FACE_DOWN_PILE:
+                # Flip the deck back over so we can restart
+                self.clear_hint()
+                with self.profiler.section("rules"):
+                    recycled = self.game.recycle_stock()
+                if recycled:
+                    self.log.record((RECYCLE, -1, BOTTOM_FACE_DOWN_PILE), 0)
+                    self.save_moved(recycled)
+                for code in recycled:
+                    self.slide_card(code)
+                self.move_sprites(recycled, BOTTOM_FACE_UP_PILE, BOTTOM_FACE_DOWN_PILE)
+
+    def is_double_click(self, code):
+        """ Is a press on a face-up card the second of a double-click on it? """
+        last_code, last_time = self.last_click
+        self.last_click = (None, 0.0)
+        return last_code == code and time.perf_counter() - last_time <= DOUBLE_CLICK_TIME
 
     def get_pile_for_card(self, card):
         """ What pile is this card in? """
-        for index, pile in enumerate(self.piles):
-            if card in pile:
-                return index
+        return self.game.pile_index_of(card.code)
 
     def move_card_to_new_pile(self, card, pile_index):
-        """ Move the card to a new pile """
-        self.remove_card_from_pile(card)
-        self.piles[pile_index].append(card)
-
-    @staticmethod
-    def check_valid_tableau_sequence(pile):
-        """
-        Check if the tableau pile has a valid sequence
-        """
-        if len(pile) >= 2:
-            valid_sequence = True
-            for i in range(1, len(pile)):
-                current_card = pile[i]
-                previous_card = pile[i - 1]
-                if (
-                        CARD_VALUES.index(current_card.value) >= CARD_VALUES.index(previous_card.value)
-                        or current_card.suit != previous_card.suit
-                ):
-                    valid_sequence = False
-                    break
-            if valid_sequence:
-                return True
-        return False
-
-    @staticmethod
-    def check_valid_foundation_sequence(pile):
-        """
-        Check if the foundation pile has a valid sequence
-        """
-        if len(pile) == 13:
-            suit = pile[0].suit
-            valid_sequence = True
-            for i, card in enumerate(pile):
-                if (
-                        card.suit != suit
-                        or card.value != CARD_VALUES[i]
-                ):
-                    valid_sequence = False
-                    break
-            if valid_sequence:
-                return True
-        return False
+        """ Move the card, and any cards stacked on it, to a new pile """
+        return self.game.move(card.code, pile_index)
 
     def check_win_condition(self):
-        # Check if all foundation piles have cards with the same suit
-        suits = set(card.suit for card in self.piles[TOP_PILE_1])
-        if len(suits) == 1:
-            # Check if all foundation piles have cards in ascending order
-            for pile in range(TOP_PILE_1, TOP_PILE_4 + 1):
-                if not self.check_valid_foundation_sequence(self.piles[pile]):
-                    return False
-            return True
-        return False
+        """ Have all four foundations been built up from ace to king? """
+        return self.game.is_won()
 
     def on_update(self, delta_time):
-        # Update the main game timer
-        self.elapsed_time = time.time() - self.start_time
-
-        # Check if the main game timer has exceeded its time limit
-        if self.elapsed_time >= self.default_time_limit_1:
-            self.has_lost = True
-
-        # Check if the win condition is met
-        if self.check_win_condition():
-            self.has_won = True
-            self.on_draw()  # Call on_draw to display the winning message
+        with self.profiler.section("update"):
+            # Deal the first game once its textures are in
+            if self.pending_start is not None and CARD_TEXTURES.ready:
+                self.finish_start()
+
+            # Start the music once there's something on screen
+            if self.music and not self.music_started and self.first_frame_drawn:
+                self.music_started = True
+                self.music.play(self.music.index)
+            # Update the main game timer
+            self.elapsed_time = time.time() - self.start_time
+
+            # Start the next music track once it's ready
+            if self.music:
+                self.music.update()
+
+            # Keep the saved clock and track current
+            if self.snapshot:
+                self.snapshot.tick(self.elapsed_time, self.track_index)
+
+            # Move the cards that are on their way somewhere
+            with self.profiler.section("animation"):
+                self.tweens.update(delta_time)
+
+            # Pick up a hint once the solver is done
+            if self.hint_result is not None:
+                self.show_hint()
+
+            # Play the next batch of the end game
+            if self.finish_queue:
+                self.play_finish(delta_time)
+
+            # Check if the main game timer has exceeded its time limit
+            if self.elapsed_time >= self.default_time_limit_1 and not self.has_won:
+                self.has_lost = True
+
+            # Refresh the profile overlay now and then, not every frame
+            if self.profiler.enabled and time.perf_counter() >= self.profile_overlay_due:
+                self.hud.show_profile(self.profiler.overlay_lines())
+                self.profile_overlay_due = time.perf_counter() + PROFILE_OVERLAY_INTERVAL
 
     def on_mouse_release(self, x: float, y: float, button: int, modifiers: int):
         """ Called when the user presses a mouse button. """
-
-        # If we don't have any cards, who cares
-        if len(self.held_cards) == 0:
-            return
-
-        # Find the closest pile, in case we are in contact with more than one
-        pile, distance = arcade.get_closest_sprite(self.held_cards[0], self.pile_mat_list)
-        reset_position = True
-
-        # See if we are in contact with the closest pile
-        if arcade.check_for_collision(self.held_cards[0], pile):
-
-            # What pile is it?
-            pile_index = self.pile_mat_list.index(pile)
-
-            #  Is it the same pile we came from?
-            if pile_index == self.get_pile_for_card(self.held_cards[0]):
-                # If so, who cares. We'll just reset our position.
-                pass
-
-            # Is it on a middle play pile?
-            elif PLAY_PILE_1 <= pile_index <= PLAY_PILE_7:
-                # Are there already cards there?
-                if len(self.piles[pile_index]) > 0:
-                    # Move cards to proper position
-                    top_card = self.piles[pile_index][-1]
-                    for i, dropped_card in enumerate(self.held_cards):
-                        dropped_card.position = top_card.center_x, \
-                            top_card.center_y - CARD_VERTICAL_OFFSET * (i + 1)
-                else:
-                    # Are there no cards in the middle play pile?
-                    for i, dropped_card in enumerate(self.held_cards):
-                        # Move cards to proper position
-                        dropped_card.position = pile.center_x, \
-                            pile.center_y - CARD_VERTICAL_OFFSET * i
-
+        self.profiler.input_event()
+        with self.profiler.section("input"):
+            # If we don't have any cards, who cares
+            if len(self.held_cards) == 0:
+                return
+
+            # Find the pile the bottom held card landed on, if any
+            with self.profiler.section("hit test"):
+                pile_index = self.layout.drop_target(*self.held_cards[0].position, self.game.piles)
+            reset_position = True
+
+            # Will the game model accept the held cards there? Move them to the right pile if so.
+            with self.profiler.section("rules"):
+                moved = pile_index is not None and self.move_card_to_new_pile(self.held_cards[0], pile_index)
+            if moved:
+                self.log.record((MOVE, self.held_cards[0].code, pile_index), self.held_pile)
+                self.save_moved([card.code for card in self.held_cards])
+                self.move_sprites([card.code for card in self.held_cards], self.held_pile, pile_index)
+
+                # And into their place in it
                 for card in self.held_cards:
-                    # Cards are in the right position, but we need to move them to the right list
-                    self.move_card_to_new_pile(card, pile_index)
+                    self.slide_card(card.code)
 
                 # Success, don't reset position of cards
                 reset_position = False
+                self.clear_hint()
 
-            # Release on top play pile? And only one card held?
-            elif TOP_PILE_1 <= pile_index <= TOP_PILE_4 and len(self.held_cards) == 1:
-                # Move position of card to pile
-                self.held_cards[0].position = pile.position
-                # Move card to card list
-                for card in self.held_cards:
-                    self.move_card_to_new_pile(card, pile_index)
+                # Only a move can finish the game, so this is the one place to check
+                if self.check_win_condition():
+                    self.has_won = True
+                else:
+                    self.offer_finish()
 
-                reset_position = False
+            # A card let go of where it was picked up was clicked, not dragged;
+            # only that can be the first half of a double-click
+            if not moved and self.held_cards[0].position == self.held_cards_original_position[0]:
+                self.last_click = (self.held_cards[0].code, time.perf_counter())
 
-        if reset_position:
-            # Where-ever we were dropped, it wasn't valid. Reset each card's position
-            # to its original spot.
-            for pile_index, card in enumerate(self.held_cards):
-                card.position = self.held_cards_original_position[pile_index]
+            if reset_position:
+                # Where-ever we were dropped, it wasn't valid. Send each card back
+                # to its original spot.
+                for card, position in zip(self.held_cards, self.held_cards_original_position):
+                    self.tweens.move(card.code, *position)
 
-        # We are no longer holding cards
-        self.held_cards = []
+            # We are no longer holding cards
+            self.held_cards = []
+            self.held_pile = None
+            self.legal_targets = set()
+            self.hover_pile = None
 
     def on_mouse_motion(self, x: float, y: float, dx: float, dy: float):
         """ User moves mouse """
+        self.profiler.input_event()
+        with self.profiler.section("input"):
+            # If we are holding cards, move them with the mouse
+            for card in self.held_cards:
+                card.position = card.center_x + dx, card.center_y + dy
 
-        # If we are holding cards, move them with the mouse
-        for card in self.held_cards:
-            card.center_x += dx
-            card.center_y += dy
+            # Note which pile they'd land on, to pick it out if it's legal
+            if self.held_cards:
+                with self.profiler.section("hit test"):
+                    self.hover_pile = self.layout.drop_target(*self.held_cards[0].position, self.game.piles)
 
 
 def main():
     """ Main function """
-    window = MyGame()
-    window.setup()
+    parser = argparse.ArgumentParser(description="Play solitaire.")
+    parser.add_argument("--seed", type=int, help="deal number to play, random if not given")
+    parser.add_argument("--new", action="store_true", help="start a new game instead of the saved one")
+    parser.add_argument("--profile", action="store_true",
+                        help="print startup times, and time each frame, with an overlay and 'P' for a trace")
+    parser.add_argument("--startup-report", metavar="FILE",
+                        help="save startup timings to FILE as JSON and quit once dealt, leaving the save file alone")
+    args = parser.parse_args()
+    if args.seed is not None and not 0 <= args.seed < SEED_LIMIT:
+        parser.error(f"--seed must be from 0 to {SEED_LIMIT - 1}")
+    startup = StartupReport(STARTUP_START)
+    startup.mark("imports")
+
+    # The card textures don't need the window, so they load while it opens
+    CARD_TEXTURES.load_in_background()
+
+    # Carry on with the last game, unless asked for a particular or new one
+    resume = not (args.new or args.seed is not None or args.startup_report)
+    saved = load_snapshot(SAVE_FILE) if resume else None
+    startup.mark("save file")
+
+    window = MyGame(save_path=None if args.startup_report else SAVE_FILE, profile=args.profile)
+    # Startup times are only printed when asked for, or when profiling
+    if args.startup_report or args.profile:
+        window.startup = startup
+        window.startup_report_path = args.startup_report
+    startup.mark("window")
+
+    # Frames start straight away; the deal follows once the textures are in
+    window.start(args.seed, saved)
     arcade.run()
 
 
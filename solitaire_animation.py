@@ -0,0 +1,172 @@
+"""
+Card animation for solitaire.
+
+The game model moves cards at once; their sprites catch up here. A card
+slides from wherever it is to where it's going and turns over on the way
+if it needs to, narrowing to nothing and opening out again with the new
+face.
+
+Each card number has one slot in a set of parallel arrays (start, end,
+start time, flip), and update() moves every card in flight in a single
+pass over them. New slides queue up, and at most TWEEN_STARTS_PER_FRAME
+of them start per frame, so dealing 28 cards or recycling the stock spreads
+its work over a few frames and fans the cards out as it goes.
+"""
+import array
+from collections import deque
+
+import arcade
+
+# Seconds a card takes to get where it's going
+TWEEN_TIME = 0.25
+
+# Most slides that may start in one frame; the rest wait for the next
+TWEEN_STARTS_PER_FRAME = 3
+
+# Slot states
+IDLE = 0
+WAITING = 1
+MOVING = 2
+
+# What a slide does to the card's face
+NO_FLIP = 0
+FLIP_UP = 1
+FLIP_DOWN = 2
+
+
+def ease(t):
+    """ Smoothstep: starts and stops gently """
+    return t * t * (3 - 2 * t)
+
+
+class Tweens:
+    """ Slides and flips of card sprites, indexed by card number """
+
+    def __init__(self, duration=TWEEN_TIME, starts_per_frame=TWEEN_STARTS_PER_FRAME):
+        self.duration = duration
+        self.starts_per_frame = starts_per_frame
+        self.cards = []
+        self.clock = 0.0
+        self.reset([])
+
+    def reset(self, cards):
+        """ Drop every animation and animate these card sprites from now on """
+        count = len(cards)
+        self.cards = cards
+        self.state = bytearray(count)
+        self.flip = bytearray(count)
+        self.start_x = array.array("d", bytes(8 * count))
+        self.start_y = array.array("d", bytes(8 * count))
+        self.end_x = array.array("d", bytes(8 * count))
+        self.end_y = array.array("d", bytes(8 * count))
+        self.start_time = array.array("d", bytes(8 * count))
+        self.width = array.array("d", bytes(8 * count))
+        self.waiting = deque()
+        self.moving = []
+        # Cards in flight are drawn again on top of every pile
+        self.in_flight = arcade.SpriteList()
+
+    @property
+    def busy(self):
+        return bool(self.waiting or self.moving)
+
+    def move(self, code, x, y, face_up=None):
+        """
+        Send a card to (x, y), turning it face up or down on the way if
+        face_up says so. A card already on its way is sent on from where it is.
+        """
+        card = self.cards[code]
+        if self.state[code] == MOVING:
+            self._stop(code)
+        self.end_x[code] = x
+        self.end_y[code] = y
+        if face_up is not None and face_up != card.is_face_up:
+            self.flip[code] = FLIP_UP if face_up else FLIP_DOWN
+        else:
+            self.flip[code] = NO_FLIP
+        if self.state[code] == IDLE:
+            self.state[code] = WAITING
+            self.waiting.append(code)
+
+    def _start(self, code):
+        card = self.cards[code]
+        self.start_x[code], self.start_y[code] = card.position
+        self.start_time[code] = self.clock
+        self.width[code] = card.width
+        self.state[code] = MOVING
+        self.moving.append(code)
+        self.in_flight.append(card)
+
+    def _stop(self, code):
+        """ Leave a moving card where it is, full width, with the face it should have now """
+        card = self.cards[code]
+        if self.flip[code] and card.width != self.width[code]:
+            card.width = self.width[code]
+        self.moving.remove(code)
+        self.in_flight.remove(card)
+        self.state[code] = IDLE
+
+    def _land(self, code):
+        """ Put a card where it was going, face and all """
+        card = self.cards[code]
+        card.position = self.end_x[code], self.end_y[code]
+        if self.flip[code] == FLIP_UP and not card.is_face_up:
+            card.face_up()
+        elif self.flip[code] == FLIP_DOWN and card.is_face_up:
+            card.face_down()
+        # Only a card that started moving can have been narrowed
+        if self.flip[code] and self.state[code] == MOVING:
+            card.width = self.width[code]
+        self.flip[code] = NO_FLIP
+        self.state[code] = IDLE
+
+    def update(self, delta_time):
+        """ Start what's due to start, and move every card in flight """
+        self.clock += delta_time
+        for _ in range(min(self.starts_per_frame, len(self.waiting))):
+            self._start(self.waiting.popleft())
+
+        clock = self.clock
+        duration = self.duration
+        still_moving = []
+        for code in self.moving:
+            t = (clock - self.start_time[code]) / duration
+            card = self.cards[code]
+            if t >= 1.0:
+                self._land(code)
+                self.in_flight.remove(card)
+                continue
+            still_moving.append(code)
+            eased = ease(t)
+            start_x = self.start_x[code]
+            start_y = self.start_y[code]
+            card.position = (start_x + (self.end_x[code] - start_x) * eased,
+                             start_y + (self.end_y[code] - start_y) * eased)
+            flip = self.flip[code]
+            if flip:
+                # Narrow to nothing, turn over at halfway, open out again
+                if t >= 0.5 and card.is_face_up != (flip == FLIP_UP):
+                    if flip == FLIP_UP:
+                        card.face_up()
+                    else:
+                        card.face_down()
+                card.width = max(self.width[code] * abs(1.0 - 2.0 * t), 1.0)
+        self.moving = still_moving
+
+    def finish(self, codes=None):
+        """ Land these cards, or every card, where they're going right now """
+        if codes is None:
+            codes = [*self.moving, *self.waiting]
+        for code in codes:
+            if self.state[code] == IDLE:
+                continue
+            if self.state[code] == MOVING:
+                self.moving.remove(code)
+                self.in_flight.remove(self.cards[code])
+            else:
+                self.waiting.remove(code)
+            self._land(code)
+
+    def draw(self):
+        """ Draw the cards in flight over everything else """
+        self.in_flight.draw()
@@ -0,0 +1,124 @@
+"""
+Background music for solitaire.
+
+Tracks are streamed, so only a small buffer is decoded at a time, and the
+next track is opened on a background thread so skipping never waits on disk
+or the decoder.
+"""
+import os
+import threading
+import time
+
+import pyglet.media
+
+
+class TrackManager:
+    """ Loops one track of a playlist at a time, with Space-style skipping """
+
+    def __init__(self, tracks):
+        # Drop playlist entries that aren't there, rather than failing later
+        self.tracks = [track for track in tracks if os.path.isfile(track)]
+        missing = [track for track in tracks if track not in self.tracks]
+        if missing:
+            print(f"Skipping {len(missing)} missing music tracks: {', '.join(missing)}")
+
+        self.index = 0
+        self.player: pyglet.media.Player = None
+
+        # Track file -> opened source, filled in by preload threads
+        self._preloaded = {}
+        self._preloading = set()
+        self._lock = threading.Lock()
+
+        # Track waiting for its preload to finish before it can start, and
+        # when it was asked for
+        self._pending = None
+        self._pending_since = 0.0
+
+        # How long the last switch took from asking to playing, in seconds
+        self.last_skip_latency = None
+
+    @property
+    def current_track(self):
+        """ File name of the current track, or None """
+        return self.tracks[self.index] if self.tracks else None
+
+    @property
+    def loading(self):
+        """ Is a track waiting to start? """
+        return self._pending is not None
+
+    def _open(self, track):
+        """ Open a track for streaming, or None if it can't be decoded """
+        try:
+            return pyglet.media.load(track, streaming=True)
+        except Exception as error:
+            print(f"Can't play music track {track}: {error}")
+            return None
+
+    def _preload_worker(self, track):
+        source = self._open(track)
+        with self._lock:
+            self._preloaded[track] = source
+            self._preloading.discard(track)
+
+    def preload(self, index):
+        """ Start opening a track in the background if it isn't already """
+        track = self.tracks[index % len(self.tracks)]
+        with self._lock:
+            if track in self._preloaded or track in self._preloading:
+                return
+            self._preloading.add(track)
+        threading.Thread(target=self._preload_worker, args=(track,), daemon=True).start()
+
+    def play(self, index):
+        """ Switch to a track. It starts as soon as its source is open. """
+        if not self.tracks:
+            return
+        self.index = index % len(self.tracks)
+        self._pending = self.tracks[self.index]
+        self._pending_since = time.perf_counter()
+        self.preload(self.index)
+        self.update()
+
+    def skip(self):
+        """ Move on to the next track """
+        self.play(self.index + 1)
+
+    def update(self):
+        """ Start a pending track if its preload is done. Call once a frame. """
+        if self._pending is None:
+            return
+        with self._lock:
+            if self._pending not in self._preloaded:
+                return
+            source = self._preloaded.pop(self._pending)
+
+        if source is None:
+            # Undecodable, so drop it. The same index is now the next track.
+            self.tracks.remove(self._pending)
+            self._pending = None
+            if self.tracks:
+                self.play(self.index)
+            return
+
+        if self.player:
+            self.player.delete()
+        self.player = pyglet.media.Player()
+        self.player.queue(source)
+        self.player.loop = True  # Set looping behavior
+        self.player.play()
+
+        self._pending = None
+        self.last_skip_latency = time.perf_counter() - self._pending_since
+
+        # Get the next track ready for the next skip
+        self.preload(self.index + 1)
+
+    def toggle(self):
+        """ Pause the music if it's playing, play it if it isn't """
+        if self.player:
+            if self.player.playing:
+                self.player.pause()
+            else:
+                self.player.play()
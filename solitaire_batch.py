@@ -0,0 +1,180 @@
+"""
+Headless batch play of solitaire deals.
+
+Each seed is dealt the same way MyGame.setup deals, played out by an
+automatic strategy, and the results are added up. Seeds are handed to a
+pool of worker processes in chunks, and each chunk sends back only its
+totals, so the work scales with the number of cores.
+
+    python solitaire_batch.py --start 0 --stop 100000 --strategy greedy
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import time
+
+from solitaire_core import SEED_LIMIT, Klondike
+from solitaire_solver import TIME_BUDGET, WON, LOST, UNKNOWN, Solver, ordered_moves, settle, state_key
+
+# Give up on a greedy game after this many moves
+MAX_GREEDY_MOVES = 1000
+
+# Greedy play found no new move, or ran out of moves. Unlike the solver's
+# LOST, the deal may still be winnable.
+STUCK = "stuck"
+
+# Seeds are split into about this many chunks per worker, so a slow chunk
+# near the end doesn't leave the other workers idle, and no chunk is bigger
+# than MAX_CHUNK
+CHUNKS_PER_WORKER = 4
+MAX_CHUNK = 256
+
+
+def play_greedy(game):
+    """
+    Play the most promising move that doesn't revisit a state, until the
+    game is won or stuck. Returns (WON or STUCK, moves made).
+    """
+    moves = []
+    settle(game, moves)
+    seen = {state_key(game)}
+    while not game.is_won() and len(moves) < MAX_GREEDY_MOVES:
+        for option in ordered_moves(game):
+            child = game.copy()
+            for move in option:
+                child.apply(move)
+            child_moves = list(option)
+            settle(child, child_moves)
+            key = state_key(child)
+            if key not in seen:
+                seen.add(key)
+                game = child
+                moves.extend(child_moves)
+                break
+        else:
+            return STUCK, moves
+    return (WON if game.is_won() else STUCK), moves
+
+
+def plan_greedy(seed):
+    """ Worker: deal seed and play it greedily. Returns (status, moves made). """
+    game = Klondike()
+    game.deal(seed)
+    return play_greedy(game)
+
+
+def play_solver(game, time_budget=TIME_BUDGET):
+    """ Search for a win. Returns (status, moves made). """
+    result = Solver(time_budget).solve(game)
+    return result.status, result.moves
+
+
+# Ways of playing each deal
+STRATEGIES = ("greedy", "solver")
+
+
+class BatchStats:
+    """ Totals for a set of played deals, which can be merged """
+
+    def __init__(self):
+        self.games = 0
+        self.outcomes = {WON: 0, LOST: 0, UNKNOWN: 0, STUCK: 0}
+        # Moves made in won games
+        self.won_moves = 0
+        # CPU seconds spent playing, summed over every worker. Wall time per
+        # game would also count the time a worker spends waiting for a core.
+        self.play_time = 0.0
+
+    def add(self, status, moves, seconds):
+        self.games += 1
+        self.outcomes[status] += 1
+        if status == WON:
+            self.won_moves += len(moves)
+        self.play_time += seconds
+
+    def merge(self, other):
+        self.games += other.games
+        for status, count in other.outcomes.items():
+            self.outcomes[status] += count
+        self.won_moves += other.won_moves
+        self.play_time += other.play_time
+
+    def report(self, wall_time):
+        """ Summary lines for printing """
+        games = max(self.games, 1)
+        won = self.outcomes[WON]
+        return [
+            f"games:          {self.games}",
+            f"won:            {won} ({won / games:.1%})",
+            f"lost:           {self.outcomes[LOST]}",
+            f"unknown:        {self.outcomes[UNKNOWN]}",
+            f"stuck:          {self.outcomes[STUCK]}",
+            f"moves per win:  {self.won_moves / max(won, 1):.1f}",
+            f"cpu per game:   {self.play_time / games * 1000:.2f} ms",
+            f"wall time:      {wall_time:.2f} s ({self.games / max(wall_time, 1e-9):.0f} games/s, "
+            f"{self.play_time / max(wall_time, 1e-9):.1f} cores busy)",
+        ]
+
+
+def play_chunk(task):
+    """ Worker: deal and play every seed in [start, stop). Returns a BatchStats. """
+    start, stop, strategy, time_budget = task
+    stats = BatchStats()
+    for seed in range(start, stop):
+        game = Klondike()
+        game.deal(seed)
+        began = time.process_time()
+        if strategy == "solver":
+            status, moves = play_solver(game, time_budget)
+        else:
+            status, moves = play_greedy(game)
+        stats.add(status, moves, time.process_time() - began)
+    return stats
+
+
+def chunk_size_for(seed_count, workers):
+    """ Seeds per chunk that spreads seed_count seeds evenly over the workers """
+    return max(1, min(MAX_CHUNK, math.ceil(seed_count / (workers * CHUNKS_PER_WORKER))))
+
+
+def run_batch(start, stop, strategy="greedy", workers=None, chunk_size=None, time_budget=TIME_BUDGET):
+    """ Play seeds [start, stop) across a process pool. Returns the merged BatchStats. """
+    if chunk_size is None:
+        chunk_size = chunk_size_for(stop - start, workers or os.cpu_count() or 1)
+    tasks = [(chunk, min(chunk + chunk_size, stop), strategy, time_budget)
+             for chunk in range(start, stop, chunk_size)]
+    stats = BatchStats()
+    if workers == 1:
+        for task in tasks:
+            stats.merge(play_chunk(task))
+        return stats
+    with multiprocessing.Pool(workers) as pool:
+        for chunk_stats in pool.imap_unordered(play_chunk, tasks):
+            stats.merge(chunk_stats)
+    return stats
+
+
+def main():
+    """ Main function """
+    parser = argparse.ArgumentParser(description="Play a range of solitaire deals headless.")
+    parser.add_argument("--start", type=int, default=0, help="first seed")
+    parser.add_argument("--stop", type=int, default=1000, help="seed to stop before")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="greedy", help="how to play each deal")
+    parser.add_argument("--budget", type=float, default=TIME_BUDGET, help="seconds per deal for the solver")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--chunk", type=int, help="seeds per chunk of work, worked out from the range if not given")
+    args = parser.parse_args()
+    if not 0 <= args.start <= args.stop <= SEED_LIMIT:
+        parser.error(f"--start and --stop must be in order, from 0 to {SEED_LIMIT}")
+    if args.workers < 1 or (args.chunk is not None and args.chunk < 1):
+        parser.error("--workers and --chunk must be at least 1")
+
+    began = time.perf_counter()
+    stats = run_batch(args.start, args.stop, args.strategy, args.workers, args.chunk, args.budget)
+    for line in stats.report(time.perf_counter() - began):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
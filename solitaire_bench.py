@@ -0,0 +1,716 @@
+"""
+Solitaire benchmarks.
+
+Run all of them with `python solitaire_bench.py`, or name the ones to run.
+Benchmarks that need arcade open a hidden window; the rest are headless.
+Add --headless to render offscreen where there is no display.
+
+Each benchmark runs --repeat times and reports the median of each result.
+Baselines belong to the machine they were taken on, so none is kept in the
+repository. Take one before a change and compare against it after:
+
+    python solitaire_bench.py --headless --save-baseline
+    python solitaire_bench.py --headless
+
+Later runs print the change from the baseline, and exit with status 1 if a
+gated result got slower than --threshold. The old code paths kept for
+reference, and worst-case and p95 results, are shown but not gated: they
+are single samples or tails, and too noisy to fail a run on.
+"""
+import argparse
+import gc
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+import timeit
+
+import solitaire_core
+import solitaire_layout
+
+# Results to compare against, written with --save-baseline
+BASELINE_FILE = "bench_baseline.json"
+
+# Slower than the baseline by more than this fraction is a regression
+REGRESSION_THRESHOLD = 0.25
+
+# Runs of each benchmark, whose median is reported
+BENCHMARK_REPEATS = 3
+
+# Results shown but never counted as regressions: the old code paths kept
+# for comparison, and single worst-case samples and tails
+UNGATED_LABELS = (
+    "(strings)", "load per flip", "pull_to_top", "one card list", "draw_text per string", "full decode",
+    "worst", "p95",
+)
+
+
+def frame_stats(frame_times):
+    """ Mean and worst of a list of frame times, in seconds """
+    return sum(frame_times) / len(frame_times), max(frame_times)
+
+
+def per_call(func, *args, number=20000, repeat=5):
+    """ Best time of one call to func(*args), in seconds """
+    timer = timeit.Timer(lambda: func(*args))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def format_time(seconds):
+    """ Seconds in whichever unit reads best """
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:10.3f} us"
+    return f"{seconds * 1e3:10.3f} ms"
+
+
+class LegacyCard:
+    """ The old string-only card, for before/after comparisons """
+
+    __slots__ = ("suit", "value")
+
+    def __init__(self, card):
+        self.suit = solitaire_core.CARD_SUITS[solitaire_core.card_suit(card)]
+        self.value = solitaire_core.CARD_VALUES[solitaire_core.card_rank(card)]
+
+    def is_red(self):
+        return self.suit in ["Hearts", "Diamonds"]
+
+
+def legacy_tableau_sequence(pile):
+    """ check_valid_tableau_sequence as it was, using CARD_VALUES.index """
+    if len(pile) >= 2:
+        for i in range(1, len(pile)):
+            current_card = pile[i]
+            previous_card = pile[i - 1]
+            if (
+                    solitaire_core.CARD_VALUES.index(current_card.value)
+                    >= solitaire_core.CARD_VALUES.index(previous_card.value)
+                    or current_card.suit != previous_card.suit
+            ):
+                return False
+        return True
+    return False
+
+
+def legacy_foundation_sequence(pile):
+    """ check_valid_foundation_sequence as it was, comparing strings """
+    if len(pile) == 13:
+        suit = pile[0].suit
+        for i, card in enumerate(pile):
+            if card.suit != suit or card.value != solitaire_core.CARD_VALUES[i]:
+                return False
+        return True
+    return False
+
+
+def run_game():
+    """
+    A game with a whole alternating-colour run, king to ace, face up on the
+    first play pile, and hearts built up to the queen with the king waiting
+    on the waste. The worst case for the run scan, and a foundation drop.
+    """
+    run = [solitaire_core.make_card(3 if rank % 2 == 0 else 2, rank) for rank in reversed(range(13))]
+    hearts = [solitaire_core.make_card(1, rank) for rank in range(12)]
+    king = solitaire_core.make_card(1, 12)
+    piles = [[] for _ in range(solitaire_core.PILE_COUNT)]
+    piles[solitaire_core.PLAY_PILE_1] = run
+    piles[solitaire_core.TOP_PILE_1] = hearts
+    piles[solitaire_core.BOTTOM_FACE_UP_PILE] = [king]
+    piles[solitaire_core.BOTTOM_FACE_DOWN_PILE] = [card for card in range(solitaire_core.CARD_COUNT)
+                                                   if card not in run + hearts + [king]]
+    game = solitaire_core.Klondike()
+    game.set_piles(piles, run + hearts + [king])
+    return game, king
+
+
+def bench_validators():
+    """
+    Per-call cost of the rule checks, string based versus lookup tables. The
+    old validators scanned whole piles; the game scans the face-up run on a
+    play pile and checks drops against the foundation's next rank.
+    """
+    # The worst case for the old checks: a whole suit, so every card gets compared
+    suit = [solitaire_core.make_card(1, rank) for rank in range(13)]
+    legacy_suit = [LegacyCard(card) for card in suit]
+    game, king = run_game()
+
+    return [
+        ("tableau sequence, 13 cards (strings)", per_call(legacy_tableau_sequence, legacy_suit[::-1])),
+        ("run_start, 13 cards (tables)", per_call(game.run_start, solitaire_core.PLAY_PILE_1)),
+        ("foundation sequence, 13 cards (strings)", per_call(legacy_foundation_sequence, legacy_suit)),
+        ("accepts, foundation (tables)", per_call(game.accepts, solitaire_core.TOP_PILE_1, king)),
+        ("is_won (tables)", per_call(game.is_won)),
+        ("card colour (strings)", per_call(legacy_suit[0].is_red)),
+        ("card colour (tables)", per_call(solitaire_core.card_color, suit[0])),
+    ]
+
+
+def bench_textures():
+    """ Texture loading, first deal, and frame time of frames that flip a card """
+    import arcade
+    import solitaire
+
+    window = solitaire.MyGame(visible=False, music=False)
+    results = []
+
+    # Cold load of every card texture
+    arcade.load_texture.texture_cache.clear()
+    results.append(("load 53 card textures", solitaire.CardTextures().load()))
+    solitaire.CARD_TEXTURES.load()
+
+    start = time.perf_counter()
+    window.setup()
+    results.append(("first deal (setup)", time.perf_counter() - start))
+
+    def flip_frames(flip_up, preload):
+        """ Flip each card up then down again, one flip per drawn frame """
+        sprite_list = arcade.SpriteList(atlas=arcade.TextureAtlas((2048, 2048)))
+        if preload:
+            sprite_list.preload_textures(solitaire.CARD_TEXTURES.all())
+        cards = [solitaire.Card(suit, value, solitaire.CARD_SCALE)
+                 for suit in solitaire.CARD_SUITS for value in solitaire.CARD_VALUES]
+        for card in cards:
+            sprite_list.append(card)
+        frame_times = []
+        for card in cards * 2:
+            start = time.perf_counter()
+            if card.is_face_up:
+                card.face_down()
+            else:
+                flip_up(card)
+            sprite_list.draw()
+            window.ctx.finish()
+            frame_times.append(time.perf_counter() - start)
+        return frame_stats(frame_times)
+
+    def load_per_flip(card):
+        # What Card.face_up used to do: look up the file every flip, and
+        # upload the face into the atlas the first time it's drawn
+        card.texture = arcade.load_texture(f":resources:images/cards/card{card.suit}{card.value}.png")
+        card.is_face_up = True
+
+    arcade.load_texture.texture_cache.clear()
+    mean, worst = flip_frames(load_per_flip, preload=False)
+    results.append(("flip frame, load per flip (mean)", mean))
+    results.append(("flip frame, load per flip (worst)", worst))
+
+    mean, worst = flip_frames(solitaire.Card.face_up, preload=True)
+    results.append(("flip frame, cached atlas (mean)", mean))
+    results.append(("flip frame, cached atlas (worst)", worst))
+
+    window.close()
+    return results
+
+
+def bench_drag(frames=120):
+    """ Frame time of picking up, dragging and dropping a 13-card tableau run """
+    import arcade
+    import solitaire
+
+    window = solitaire.MyGame(visible=False, music=False)
+    window.setup(0)
+
+    # A king-to-ace run alone on the first play pile, everything else in the stock
+    run = [solitaire_core.make_card(rank % 2, rank) for rank in reversed(range(13))]
+    piles = [[] for _ in range(solitaire_core.PILE_COUNT)]
+    piles[solitaire_core.PLAY_PILE_1] = run
+    piles[solitaire_core.BOTTOM_FACE_DOWN_PILE] = [card for card in range(solitaire_core.CARD_COUNT)
+                                                   if card not in run]
+    window.game.set_piles(piles, run)
+    window.build_pile_sprites()
+    results = []
+
+    def frame(work):
+        start = time.perf_counter()
+        work()
+        window.draw_cards()
+        window.ctx.finish()
+        return time.perf_counter() - start
+
+    # What dragging used to do: one list for every card, and pull_to_top
+    # (remove then append) for each held card on pick-up. It gets its own
+    # copies of the sprites, laid out the same.
+    card_list = arcade.SpriteList()
+    legacy_cards = {}
+    for sprites in window.pile_sprites:
+        for sprite in sprites:
+            card = solitaire.Card(sprite.suit, sprite.value, solitaire.CARD_SCALE)
+            card.position = sprite.position
+            card.texture = sprite.texture
+            card_list.append(card)
+            legacy_cards[sprite.code] = card
+    held = [legacy_cards[card] for card in run]
+
+    def legacy_pick_up():
+        for card in held:
+            card_list.remove(card)
+            card_list.append(card)
+
+    def legacy_drag():
+        for card in held:
+            card.center_x += 1
+            card.center_y -= 1
+
+    def legacy_frame(work):
+        start = time.perf_counter()
+        work()
+        card_list.draw()
+        window.ctx.finish()
+        return time.perf_counter() - start
+
+    # Draw once first so both start with buffers on the GPU
+    legacy_frame(lambda: None)
+    results.append(("pick up, pull_to_top (CPU only)", per_call(legacy_pick_up, number=2000)))
+    results.append(("pick up, pull_to_top (frame)", legacy_frame(legacy_pick_up)))
+    mean, worst = frame_stats([legacy_frame(legacy_drag) for _ in range(frames)])
+    results.append(("drag, one card list (mean frame)", mean))
+    results.append(("drag, one card list (worst frame)", worst))
+
+    # The same through MyGame's mouse handlers, with per-pile lists
+    # Grab the king by the strip of it that shows above the next card
+    x, y = window.layout.card_position(solitaire_core.PLAY_PILE_1, 0)
+    y += solitaire_layout.CARD_HEIGHT / 2 - solitaire_layout.CARD_VERTICAL_OFFSET / 2
+    target_x, target_y = window.layout.pile_positions[solitaire_core.PLAY_PILE_1 + 1]
+    frame(lambda: None)
+    results.append(("pick up, pile lists (CPU only)", per_call(window.on_mouse_press, x, y, 1, 0, number=2000)))
+    results.append(("pick up, pile lists (frame)", frame(lambda: window.on_mouse_press(x, y, 1, 0))))
+    step_x, step_y = (target_x - x) / frames, (target_y - y) / frames
+    mean, worst = frame_stats([frame(lambda: window.on_mouse_motion(x, y, step_x, step_y))
+                               for _ in range(frames)])
+    results.append(("drag, pile lists (mean frame)", mean))
+    results.append(("drag, pile lists (worst frame)", worst))
+    results.append(("drop onto another pile, pile lists (frame)",
+                    frame(lambda: window.on_mouse_release(target_x, target_y, 1, 0))))
+    assert window.game.pile_index_of(run[0]) == solitaire_core.PLAY_PILE_1 + 1, "the run wasn't dropped"
+
+    window.close()
+    return results
+
+
+def bench_hud(frames=180):
+    """ Per-frame cost of the HUD text: draw_text every frame versus cached labels """
+    import arcade
+    import solitaire
+    import solitaire_hud
+
+    window = solitaire.MyGame(visible=False, music=False)
+    window.setup(0)
+    window.hint_text = "Hint: Move the 8 of Hearts to play pile 3"
+    results = []
+
+    def hud_frames(draw_hud):
+        """ Draw the HUD alone for frames frames of a running clock """
+        frame_times = []
+        for frame in range(frames):
+            window.elapsed_time = frame / 60
+            start = time.perf_counter()
+            draw_hud()
+            window.ctx.finish()
+            frame_times.append(time.perf_counter() - start)
+        return frame_stats(frame_times)
+
+    def legacy_hud():
+        # What on_draw used to do: lay out and draw every string, every frame
+        remaining_time = max(0, window.default_time_limit_1 - int(window.elapsed_time))
+        minutes = remaining_time // 60
+        seconds = remaining_time % 60
+        time_text = f"Time: {minutes:02}:{seconds:02}"
+        arcade.draw_text(time_text, solitaire_layout.SCREEN_WIDTH - 10, solitaire_layout.SCREEN_HEIGHT - 30,
+                         arcade.color.WHITE, 18, anchor_x="right")
+        arcade.draw_text(window.hint_text, solitaire_layout.SCREEN_WIDTH - 10, solitaire_layout.SCREEN_HEIGHT - 60,
+                         arcade.color.WHITE, 14, anchor_x="right")
+        arcade.draw_text(f"Deal {window.game.seed}", solitaire_layout.SCREEN_WIDTH - 10,
+                         solitaire_layout.SCREEN_HEIGHT - 90, arcade.color.WHITE, 14, anchor_x="right")
+        for i, line in enumerate(solitaire_hud.HELP_LINES):
+            arcade.draw_text(line, solitaire_layout.SCREEN_WIDTH - 5, solitaire_hud.help_line_y(i),
+                             arcade.color.WHITE, 18, anchor_x="right")
+
+    def cached_hud():
+        window.hud.show_time(max(0, window.default_time_limit_1 - int(window.elapsed_time)))
+        window.hud.set_text(window.hud.hint, window.hint_text)
+        window.hud.draw()
+
+    mean, worst = hud_frames(legacy_hud)
+    results.append(("HUD, draw_text per string (mean frame)", mean))
+    results.append(("HUD, draw_text per string (worst frame)", worst))
+    mean, worst = hud_frames(cached_hud)
+    results.append(("HUD, cached labels in a batch (mean frame)", mean))
+    results.append(("HUD, cached labels in a batch (worst frame)", worst))
+
+    # Where a whole on_draw frame goes now, part by part
+    parts = {"clear": window.clear, "mats": window.pile_mat_list.draw, "cards": window.draw_cards,
+             "HUD": cached_hud}
+    totals = dict.fromkeys(parts, 0.0)
+    for frame in range(frames):
+        window.elapsed_time = frame / 60
+        for name, draw_part in parts.items():
+            start = time.perf_counter()
+            draw_part()
+            window.ctx.finish()
+            totals[name] += time.perf_counter() - start
+    for name, total in totals.items():
+        results.append((f"frame profile: {name} (mean)", total / frames))
+
+    window.close()
+    return results
+
+
+def bench_music(skips=6):
+    """ Music skips: worst time a frame spends on them, and time until the next track plays """
+    import pyglet
+    from solitaire_audio import TrackManager
+
+    tracks = sorted(glob.glob("musics/*.mp3"))
+    results = []
+
+    # What play_track used to do on every skip: decode the whole file on the UI thread
+    largest = max(tracks, key=lambda track: os.path.getsize(track))
+    try:
+        start = time.perf_counter()
+        pyglet.media.load(largest, streaming=False)
+        results.append((f"full decode of {largest}", time.perf_counter() - start))
+    except Exception as error:
+        print(f"Can't decode {largest}: {error}")
+
+    music = TrackManager(tracks)
+    music.play(0)
+    worst_frame = 0.0
+    latencies = []
+    for _ in range(skips):
+        start = time.perf_counter()
+        music.skip()
+        worst_frame = max(worst_frame, time.perf_counter() - start)
+        # Keep calling update() once a "frame" until the track starts
+        while music.loading:
+            time.sleep(1 / 60)
+            start = time.perf_counter()
+            music.update()
+            worst_frame = max(worst_frame, time.perf_counter() - start)
+        if not music.tracks:
+            print("No playable music tracks")
+            return results
+        latencies.append(music.last_skip_latency)
+
+    results.append(("skip, worst frame blocked", worst_frame))
+    results.append(("skip, mean time to start playing", sum(latencies) / len(latencies)))
+    music.player.delete()
+    return results
+
+
+def latency_stats(times):
+    """ Median and 95th percentile of a list of times, in seconds """
+    ordered = sorted(times)
+    return ordered[len(ordered) // 2], ordered[min(len(ordered) - 1, len(ordered) * 95 // 100)]
+
+
+def scripted_moves(seed):
+    """ The moves greedy play makes in deal seed: a reproducible game script """
+    from solitaire_batch import play_greedy
+
+    game = solitaire_core.Klondike()
+    game.deal(seed)
+    _, moves = play_greedy(game)
+    return moves
+
+
+def card_point(window, card):
+    """ A point on the visible part of a card, for clicking it """
+    pile_index = window.game.pile_of[card]
+    depth = window.game.depth_of[card]
+    x, y = window.layout.card_position(pile_index, depth)
+    if depth < len(window.game.piles[pile_index]) - 1:
+        # Covered by the next card down the fan, except for a strip at the top
+        y += solitaire_layout.CARD_HEIGHT / 2 - solitaire_layout.CARD_VERTICAL_OFFSET / 2
+    return x, y
+
+
+def drive_move(window, move, timings):
+    """
+    Make a move through MyGame's mouse handlers, timing each handler call.
+    Returns True if that started the end game, which has then played out.
+    """
+
+    def timed(name, handler, *args):
+        start = time.perf_counter()
+        handler(*args)
+        timings.setdefault(name, []).append(time.perf_counter() - start)
+
+    kind, card, pile_index = move
+    if kind == solitaire_core.DRAW or kind == solitaire_core.RECYCLE:
+        # Click the stock, or its empty mat
+        x, y = window.layout.pile_positions[solitaire_core.BOTTOM_FACE_DOWN_PILE]
+        timed("on_mouse_press", window.on_mouse_press, x, y, 1, 0)
+    elif kind == solitaire_core.FLIP:
+        timed("on_mouse_press", window.on_mouse_press, *card_point(window, card), 1, 0)
+    else:
+        # Pick the card up, carry it onto the next free spot of the pile, and let go
+        x, y = card_point(window, card)
+        target_x, target_y = window.layout.card_position(pile_index, len(window.game.piles[pile_index]))
+        timed("on_mouse_press", window.on_mouse_press, x, y, 1, 0)
+        held_x, held_y = window.held_cards[0].position
+        timed("on_mouse_motion", window.on_mouse_motion, target_x, target_y, target_x - held_x, target_y - held_y)
+        timed("on_mouse_release", window.on_mouse_release, target_x, target_y, 1, 0)
+
+    # Once every card is face up and the stock is gone the game plays the
+    # rest itself, ignoring the mouse. Let it, a frame at a time.
+    if not window.finish_queue:
+        return False
+    while window.finish_queue:
+        window.on_update(1 / 60)
+    return True
+
+
+def bench_game(seeds=range(10)):
+    """ Scripted games played through MyGame's mouse handlers: latency per handler and per move """
+    import solitaire
+
+    window = solitaire.MyGame(visible=False, music=False)
+    timings = {}
+    move_count = 0
+    start = time.perf_counter()
+    for seed in seeds:
+        moves = scripted_moves(seed)
+        window.setup(seed)
+        expected = solitaire_core.Klondike()
+        expected.deal(seed)
+        for move in moves:
+            move_count += 1
+            finished = drive_move(window, move, timings)
+            if finished:
+                # The rest of the script is the game's to play now
+                if not window.game.is_won():
+                    raise RuntimeError(f"deal {seed}: the end game didn't win")
+                break
+            expected.apply(move)
+            if window.game.piles != expected.piles:
+                raise RuntimeError(f"deal {seed}: the mouse didn't make {move}")
+    elapsed = time.perf_counter() - start
+    window.close()
+
+    results = [("scripted games, time per move", elapsed / move_count)]
+    for name, times in timings.items():
+        median, p95 = latency_stats(times)
+        results.append((f"{name} (median)", median))
+        results.append((f"{name} (p95)", p95))
+    return results
+
+
+def bench_ops():
+    """ Per-call latency of the game's rule and move operations, as MyGame calls them """
+    import solitaire
+
+    window = solitaire.MyGame(visible=False, music=False)
+    results = []
+
+    setup_times = []
+    for seed in range(20):
+        start = time.perf_counter()
+        window.setup(seed)
+        setup_times.append(time.perf_counter() - start)
+    results.append(("setup (median)", latency_stats(setup_times)[0]))
+
+    # Play a scripted game up to its first move between piles, and time that
+    moves = scripted_moves(0)
+    window.setup(0)
+    first = next(index for index, move in enumerate(moves) if move[0] == solitaire_core.MOVE)
+    for move in moves[:first]:
+        window.log.apply(window.game, move)
+    _, code, pile_index = moves[first]
+    card = window.cards[code]
+    source = window.game.pile_index_of(code)
+
+    def move_and_take_back():
+        window.move_card_to_new_pile(card, pile_index)
+        window.game.unapply(moves[first], source)
+
+    run_state, _ = run_game()
+    results += [
+        ("get_pile_for_card", per_call(window.get_pile_for_card, card)),
+        ("move_card_to_new_pile, and unapply", per_call(move_and_take_back)),
+        ("check_win_condition", per_call(window.check_win_condition)),
+        ("run_start, 13 cards", per_call(run_state.run_start, solitaire_core.PLAY_PILE_1)),
+        ("legal_moves", per_call(lambda: sum(1 for _ in window.game.legal_moves()))),
+        ("hit_test", per_call(window.layout.hit_test, *card_point(window, code), window.game.piles)),
+        ("drop_target", per_call(window.layout.drop_target, *card_point(window, code), window.game.piles)),
+    ]
+    window.close()
+    return results
+
+
+def bench_animation(frame_time=1 / 60):
+    """ Frame time while the deal and a stock recycle animate, and the cost of the tween pass alone """
+    import solitaire
+
+    window = solitaire.MyGame(visible=False, music=False)
+    results = []
+
+    def animate():
+        """ Run frames until every card has landed. Mean and worst frame. """
+        frame_times = []
+        while window.tweens.busy:
+            start = time.perf_counter()
+            window.on_update(frame_time)
+            window.draw_cards()
+            window.tweens.draw()
+            window.ctx.finish()
+            frame_times.append(time.perf_counter() - start)
+        return frame_stats(frame_times)
+
+    window.setup(0)
+    mean, worst = animate()
+    results.append(("deal 28 cards (mean frame)", mean))
+    results.append(("deal 28 cards (worst frame)", worst))
+
+    # Draw the whole stock, then turn it all back over at once
+    stock = window.layout.card_position(solitaire_core.BOTTOM_FACE_DOWN_PILE, 0)
+    while window.game.piles[solitaire_core.BOTTOM_FACE_DOWN_PILE]:
+        window.on_mouse_press(*stock, 1, 0)
+    window.tweens.finish()
+    window.on_mouse_press(*stock, 1, 0)
+    mean, worst = animate()
+    results.append(("recycle the stock (mean frame)", mean))
+    results.append(("recycle the stock (worst frame)", worst))
+
+    # The tween pass by itself, with every card in flight
+    window.build_pile_sprites()
+    for code in range(solitaire_core.CARD_COUNT):
+        window.tweens.move(code, 0.0, 0.0, face_up=True)
+    window.tweens.starts_per_frame = solitaire_core.CARD_COUNT
+    window.tweens.duration = 1e9
+    window.tweens.update(0.0)
+    results.append(("tween update, 52 cards", per_call(window.tweens.update, frame_time / 1e6, number=2000)))
+
+    window.close()
+    return results
+
+
+def bench_tables(counts=(1, 4, 16, 64), frames=60):
+    """ Frame time of the multi-table window as the number of tables grows """
+    import solitaire_tables
+
+    results = []
+    for count in counts:
+        window = solitaire_tables.TableGrid(count, visible=False)
+        # Time full tables, not ones waiting for their first plans
+        while window.waiting:
+            window.on_update(1 / 60)
+            time.sleep(0.01)
+        frame_times = []
+        for _ in range(frames):
+            start = time.perf_counter()
+            window.on_update(1 / 60)
+            window.on_draw()
+            window.ctx.finish()
+            frame_times.append(time.perf_counter() - start)
+        mean, _ = frame_stats(frame_times)
+        results.append((f"{count} tables (mean frame)", mean))
+        window.close()
+        del window
+        gc.collect()
+    return results
+
+
+BENCHMARKS = {
+    "validators": bench_validators,
+    "textures": bench_textures,
+    "drag": bench_drag,
+    "hud": bench_hud,
+    "music": bench_music,
+    "ops": bench_ops,
+    "game": bench_game,
+    "animation": bench_animation,
+    "tables": bench_tables,
+}
+
+
+def gated(label):
+    """ Does a slowdown in this result count as a regression? """
+    return not any(marker in label for marker in UNGATED_LABELS)
+
+
+def run_benchmark(name, repeat=BENCHMARK_REPEATS):
+    """ Run a benchmark repeat times. Returns (label, median seconds) in the order it reports them. """
+    runs = []
+    for _ in range(repeat):
+        runs.append(dict(BENCHMARKS[name]()))
+        # A closed window that's only collected later closes itself again,
+        # which unsets the next benchmark's window, so let it go now
+        gc.collect()
+    return [(label, statistics.median(run[label] for run in runs if label in run)) for label in runs[0]]
+
+
+def load_baseline(path):
+    """ Stored results: benchmark name -> label -> seconds. Empty if there's no file. """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_baseline(path, results):
+    """ Merge results into the stored baseline """
+    baseline = load_baseline(path)
+    for name, timings in results.items():
+        baseline[name] = dict(timings)
+    with open(path, "w") as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+
+
+def main():
+    """ Main function """
+    parser = argparse.ArgumentParser(description="Run solitaire benchmarks.")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--headless", action="store_true", help="render offscreen, without a display")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="file of stored results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="how much slower than the baseline counts as a regression, 0.25 = 25%%")
+    parser.add_argument("--repeat", type=int, default=BENCHMARK_REPEATS,
+                        help="runs of each benchmark, whose median is reported")
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    if args.headless:
+        # Has to happen before anything imports arcade. Nor should pyglet make
+        # its shadow window when pyglet.media is imported first; arcade turns
+        # that off too, but only once it's imported.
+        import pyglet
+        pyglet.options["headless"] = True
+        pyglet.options["shadow_window"] = False
+
+    baseline = load_baseline(args.baseline)
+    results = {}
+    regressions = []
+    for name in args.names or BENCHMARKS:
+        print(f"== {name}")
+        results[name] = run_benchmark(name, args.repeat)
+        for label, seconds in results[name]:
+            before = baseline.get(name, {}).get(label)
+            if before is None:
+                print(f"{label:<45} {format_time(seconds)}")
+                continue
+            change = seconds / before - 1 if before else 0.0
+            flag = ""
+            if change > args.threshold and gated(label):
+                flag = "  REGRESSION"
+                regressions.append(f"{name}: {label}")
+            print(f"{label:<45} {format_time(seconds)}  {change:+7.1%} vs baseline{flag}")
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} results more than {args.threshold:.0%} slower than the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
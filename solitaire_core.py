@@ -0,0 +1,578 @@
+"""
+Headless solitaire game model.
+
+Cards are small ints (suit * 13 + rank) and piles are plain lists of them, so
+games can be dealt, played and checked without arcade, textures or a window.
+MyGame in solitaire.py drives one of these and only mirrors it with sprites.
+"""
+import random
+
+# Card constants
+CARD_VALUES = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
+CARD_SUITS = ["Clubs", "Hearts", "Spades", "Diamonds"]
+CARD_COUNT = len(CARD_SUITS) * len(CARD_VALUES)
+
+# Card colours. Hearts and Diamonds sit at odd suit indexes.
+BLACK = 0
+RED = 1
+
+# Deal numbers run from 0 up to, but not including, this
+SEED_LIMIT = 2 ** 32
+
+# How many cards the stock flips over at a time
+DRAW_COUNT = 3
+
+# Kinds of move. A move is a (kind, card, pile index) tuple; DRAW and
+# RECYCLE ignore card and pile, FLIP ignores pile.
+DRAW = 0
+RECYCLE = 1
+FLIP = 2
+MOVE = 3
+
+# Constants that represent "what pile is what" for the game
+PILE_COUNT = 13
+BOTTOM_FACE_DOWN_PILE = 0
+BOTTOM_FACE_UP_PILE = 1
+PLAY_PILE_1 = 2
+PLAY_PILE_2 = 3
+PLAY_PILE_3 = 4
+PLAY_PILE_4 = 5
+PLAY_PILE_5 = 6
+PLAY_PILE_6 = 7
+PLAY_PILE_7 = 8
+TOP_PILE_1 = 9
+TOP_PILE_2 = 10
+TOP_PILE_3 = 11
+TOP_PILE_4 = 12
+
+
+def make_card(suit, rank):
+    """ Encode a suit index and rank index as a card number """
+    return suit * len(CARD_VALUES) + rank
+
+
+# Rank index of the king, the only card an empty play pile takes
+KING = len(CARD_VALUES) - 1
+
+# Lookup tables from card number to rank index, suit index and colour, for
+# the rule code's inner loops
+RANK = bytes(card % len(CARD_VALUES) for card in range(CARD_COUNT))
+SUIT = bytes(card // len(CARD_VALUES) for card in range(CARD_COUNT))
+COLOR = bytes(suit & 1 for suit in SUIT)
+
+
+def card_suit(card):
+    """ Suit index (into CARD_SUITS) of a card number """
+    return SUIT[card]
+
+
+def card_rank(card):
+    """ Rank index (into CARD_VALUES) of a card number """
+    return RANK[card]
+
+
+def card_color(card):
+    """ BLACK or RED """
+    return COLOR[card]
+
+
+def card_name(card):
+    """ Human readable name, e.g. '10 of Hearts' """
+    return f"{CARD_VALUES[card_rank(card)]} of {CARD_SUITS[card_suit(card)]}"
+
+
+def shuffled_deck(seed):
+    """
+    The deck for deal number seed, last card on top of the stock.
+
+    An unbiased Fisher-Yates shuffle driven by its own random.Random(seed),
+    so the same seed always deals the same game.
+    """
+    rng = random.Random(seed)
+    deck = list(range(CARD_COUNT))
+    for pos1 in range(CARD_COUNT - 1, 0, -1):
+        pos2 = rng.randrange(pos1 + 1)
+        deck[pos1], deck[pos2] = deck[pos2], deck[pos1]
+    return deck
+
+
+def random_seed():
+    """ A fresh deal number """
+    return random.randrange(SEED_LIMIT)
+
+
+class Klondike:
+    """
+    State of one game: thirteen piles of card numbers plus face-up flags.
+
+    pile_of and depth_of index every card's pile and position within it, so
+    looking a card up is constant time. foundation_built counts how many
+    cards at the bottom of each foundation run ace upwards in one suit, so
+    the win check is constant time too. Every method that moves cards keeps
+    these in step with piles; check_index() verifies that.
+    """
+
+    __slots__ = ("seed", "piles", "face_up", "pile_of", "depth_of", "foundation_built", "complete_foundations")
+
+    def __init__(self):
+        # Deal number of this game, or None if it was dealt from a given deck
+        self.seed = None
+        # A list of lists, each holds a pile of cards, bottom card first.
+        self.piles = [[] for _ in range(PILE_COUNT)]
+        # One flag per card number
+        self.face_up = bytearray(CARD_COUNT)
+        # Card number -> pile index, and card number -> position in that pile
+        self.pile_of = bytearray(CARD_COUNT)
+        self.depth_of = bytearray(CARD_COUNT)
+        # Per foundation (TOP_PILE_1 first): length of its ace-up, one suit run
+        self.foundation_built = bytearray(TOP_PILE_4 - TOP_PILE_1 + 1)
+        # How many foundations hold a whole suit
+        self.complete_foundations = 0
+
+    def deal(self, seed=None):
+        """ Deal game number seed, or a random one. Returns the seed. """
+        if seed is None:
+            seed = random_seed()
+        elif not 0 <= seed < SEED_LIMIT:
+            # Saves and replays keep the deal number in 32 bits
+            raise ValueError(f"deal number {seed} is outside 0 to {SEED_LIMIT - 1}")
+        self.deal_deck(shuffled_deck(seed))
+        self.seed = seed
+        return seed
+
+    def deal_deck(self, deck):
+        """ Deal an already ordered deck. The last card is the top of the stock. """
+        stock = list(deck)
+        piles = [[] for _ in range(PILE_COUNT)]
+
+        # Pull from the stock into the middle piles, all face-down
+        for pile_no in range(PLAY_PILE_1, PLAY_PILE_7 + 1):
+            for _ in range(pile_no - PLAY_PILE_1 + 1):
+                piles[pile_no].append(stock.pop())
+        piles[BOTTOM_FACE_DOWN_PILE] = stock
+
+        # Flip up the top cards
+        self.set_piles(piles, [piles[pile_no][-1] for pile_no in range(PLAY_PILE_1, PLAY_PILE_7 + 1)])
+
+    def set_piles(self, piles, face_up=()):
+        """
+        Lay out any arrangement of all the cards: a list of piles, bottom card
+        first, and the cards that are face up.
+        """
+        self.seed = None
+        self.piles = [[] for _ in range(PILE_COUNT)]
+        self.face_up = bytearray(CARD_COUNT)
+        self.foundation_built = bytearray(TOP_PILE_4 - TOP_PILE_1 + 1)
+        self.complete_foundations = 0
+
+        # Build the card index and foundation counts from scratch
+        for pile_no, cards in enumerate(piles):
+            pile = self.piles[pile_no]
+            for card in cards:
+                self.pile_of[card] = pile_no
+                self.depth_of[card] = len(pile)
+                pile.append(card)
+                if TOP_PILE_1 <= pile_no <= TOP_PILE_4:
+                    self._foundation_added(pile_no, card)
+
+        for card in face_up:
+            self.face_up[card] = True
+
+    def copy(self):
+        """ Independent copy of this state """
+        other = Klondike.__new__(Klondike)
+        other.seed = self.seed
+        other.piles = [pile.copy() for pile in self.piles]
+        other.face_up = bytearray(self.face_up)
+        other.pile_of = bytearray(self.pile_of)
+        other.depth_of = bytearray(self.depth_of)
+        other.foundation_built = bytearray(self.foundation_built)
+        other.complete_foundations = self.complete_foundations
+        return other
+
+    def pile_index_of(self, card):
+        """ What pile is this card in? """
+        return self.pile_of[card]
+
+    def check_index(self):
+        """ Debug check that the card index and foundation counts agree with the piles. """
+        seen = 0
+        for pile_no, pile in enumerate(self.piles):
+            for depth, card in enumerate(pile):
+                assert self.pile_of[card] == pile_no, f"{card_name(card)} indexed in pile " \
+                                                      f"{self.pile_of[card]}, found in {pile_no}"
+                assert self.depth_of[card] == depth, f"{card_name(card)} indexed at depth " \
+                                                     f"{self.depth_of[card]}, found at {depth}"
+                seen += 1
+        assert seen == CARD_COUNT, f"{seen} cards in the piles, expected {CARD_COUNT}"
+
+        complete = 0
+        for pile_index in range(TOP_PILE_1, TOP_PILE_4 + 1):
+            pile = self.piles[pile_index]
+            built = 0
+            while (
+                    built < len(pile)
+                    and RANK[pile[built]] == built
+                    and SUIT[pile[built]] == SUIT[pile[0]]
+            ):
+                built += 1
+            assert self.foundation_built[pile_index - TOP_PILE_1] == built, \
+                f"foundation {pile_index} counted {self.foundation_built[pile_index - TOP_PILE_1]} built, found {built}"
+            complete += built == len(CARD_VALUES)
+        assert self.complete_foundations == complete, \
+            f"{self.complete_foundations} foundations counted complete, found {complete}"
+
+    def is_face_up(self, card):
+        """ Is this card face up? """
+        return bool(self.face_up[card])
+
+    def draw_stock(self):
+        """
+        Flip up to three cards from the stock onto the waste pile.
+        Returns the cards moved, in the order they landed.
+        """
+        stock = self.piles[BOTTOM_FACE_DOWN_PILE]
+        waste = self.piles[BOTTOM_FACE_UP_PILE]
+        drawn = []
+        for _ in range(DRAW_COUNT):
+            # If we ran out of cards, stop
+            if len(stock) == 0:
+                break
+            card = stock.pop()
+            self.face_up[card] = True
+            self.pile_of[card] = BOTTOM_FACE_UP_PILE
+            self.depth_of[card] = len(waste)
+            waste.append(card)
+            drawn.append(card)
+        return drawn
+
+    def recycle_stock(self):
+        """
+        Turn the waste pile back over into an empty stock.
+        Returns the cards moved, in the order they landed.
+        """
+        stock = self.piles[BOTTOM_FACE_DOWN_PILE]
+        waste = self.piles[BOTTOM_FACE_UP_PILE]
+        if len(stock) > 0:
+            return []
+        recycled = waste[::-1]
+        for depth, card in enumerate(recycled):
+            self.face_up[card] = False
+            self.pile_of[card] = BOTTOM_FACE_DOWN_PILE
+            self.depth_of[card] = depth
+        stock.extend(recycled)
+        waste.clear()
+        return recycled
+
+    def flip(self, card):
+        """ Turn a face-down card on top of a tableau pile face up. """
+        pile_index = self.pile_of[card]
+        if (
+                not PLAY_PILE_1 <= pile_index <= PLAY_PILE_7
+                or self.piles[pile_index][-1] != card
+                or self.face_up[card]
+        ):
+            return False
+        self.face_up[card] = True
+        return True
+
+    def run_start(self, pile_index):
+        """ Depth of the bottom of the face-up, alternating-colour run on top of a play pile """
+        pile = self.piles[pile_index]
+        face_up = self.face_up
+        depth = len(pile) - 1
+        while (
+                depth > 0
+                and face_up[pile[depth - 1]]
+                and RANK[pile[depth - 1]] == RANK[pile[depth]] + 1
+                and COLOR[pile[depth - 1]] != COLOR[pile[depth]]
+        ):
+            depth -= 1
+        return depth
+
+    def can_lift(self, card):
+        """ Can card be picked up, with whatever is stacked on it? """
+        pile_index = self.pile_of[card]
+        if not self.face_up[card] or pile_index == BOTTOM_FACE_DOWN_PILE:
+            return False
+        if PLAY_PILE_1 <= pile_index <= PLAY_PILE_7:
+            # Anywhere in the run on top of a play pile
+            return self.depth_of[card] >= self.run_start(pile_index)
+        # The waste and foundations only give up their top card
+        return self.piles[pile_index][-1] == card
+
+    def run_from(self, card):
+        """ The card and every card stacked on top of it, if they can be picked up together, or [] """
+        if not self.can_lift(card):
+            return []
+        return self.piles[self.pile_of[card]][self.depth_of[card]:]
+
+    def accepts(self, pile_index, card):
+        """ Would the pile take card as the bottom card of whatever lands on it? """
+        pile = self.piles[pile_index]
+        if PLAY_PILE_1 <= pile_index <= PLAY_PILE_7:
+            # Kings on empty piles, else one rank down in the other colour
+            if len(pile) == 0:
+                return RANK[card] == KING
+            top = pile[-1]
+            return self.face_up[top] and RANK[top] == RANK[card] + 1 and COLOR[top] != COLOR[card]
+        if TOP_PILE_1 <= pile_index <= TOP_PILE_4:
+            # Aces on empty foundations, else the next card of the suit
+            if len(pile) == 0:
+                return RANK[card] == 0
+            rank = self.foundation_next_rank(pile_index)
+            return rank is not None and card == pile[0] + rank
+        return False
+
+    def can_move(self, card, pile_index):
+        """ Can card, with whatever is stacked on it, be dropped on the pile? """
+        source_index = self.pile_of[card]
+        if source_index == pile_index or not self.can_lift(card) or not self.accepts(pile_index, card):
+            return False
+        if TOP_PILE_1 <= pile_index <= TOP_PILE_4:
+            # Only one card at a time goes up to the foundations, and not
+            # from another foundation
+            return self.piles[source_index][-1] == card and not TOP_PILE_1 <= source_index <= TOP_PILE_4
+        return True
+
+    def legal_moves(self):
+        """
+        Every legal move from this state, found in one pass over the piles.
+
+        Each pile is summed up by the cards it would take: the two that fit
+        under a play pile's top card, kings for an empty one, and the next
+        card up for a foundation. Every card that can be lifted is then
+        looked up in those, rather than tried against every pile.
+        """
+        piles = self.piles
+        face_up = self.face_up
+        moves = []
+
+        stock = piles[BOTTOM_FACE_DOWN_PILE]
+        waste = piles[BOTTOM_FACE_UP_PILE]
+        if len(stock) > 0:
+            moves.append((DRAW, -1, BOTTOM_FACE_UP_PILE))
+        elif len(waste) > 0:
+            moves.append((RECYCLE, -1, BOTTOM_FACE_DOWN_PILE))
+
+        # Card number -> the piles that would take it
+        tableau_wants = {}
+        foundation_wants = {}
+        for pile_index in range(PLAY_PILE_1, PLAY_PILE_7 + 1):
+            pile = piles[pile_index]
+            if len(pile) == 0:
+                for suit in range(len(CARD_SUITS)):
+                    tableau_wants.setdefault(make_card(suit, KING), []).append(pile_index)
+            elif not face_up[pile[-1]]:
+                moves.append((FLIP, pile[-1], pile_index))
+            elif RANK[pile[-1]] > 0:
+                # Suits alternate colour, so the other colour's suits are every other one
+                top = pile[-1]
+                for suit in range(1 - COLOR[top], len(CARD_SUITS), 2):
+                    tableau_wants.setdefault(make_card(suit, RANK[top] - 1), []).append(pile_index)
+        for pile_index in range(TOP_PILE_1, TOP_PILE_4 + 1):
+            pile = piles[pile_index]
+            if len(pile) == 0:
+                for suit in range(len(CARD_SUITS)):
+                    foundation_wants.setdefault(make_card(suit, 0), []).append(pile_index)
+            else:
+                rank = self.foundation_next_rank(pile_index)
+                if rank is not None:
+                    foundation_wants.setdefault(pile[0] + rank, []).append(pile_index)
+
+        # The top of the waste can go anywhere that takes it
+        if len(waste) > 0:
+            card = waste[-1]
+            for target in (*tableau_wants.get(card, ()), *foundation_wants.get(card, ())):
+                moves.append((MOVE, card, target))
+
+        # Any card of a play pile's run, and its top card up to a foundation
+        for pile_index in range(PLAY_PILE_1, PLAY_PILE_7 + 1):
+            pile = piles[pile_index]
+            if len(pile) == 0 or not face_up[pile[-1]]:
+                continue
+            for card in pile[self.run_start(pile_index):]:
+                for target in tableau_wants.get(card, ()):
+                    moves.append((MOVE, card, target))
+            for target in foundation_wants.get(pile[-1], ()):
+                moves.append((MOVE, pile[-1], target))
+
+        # Foundation tops can come back down to the play piles
+        for pile_index in range(TOP_PILE_1, TOP_PILE_4 + 1):
+            pile = piles[pile_index]
+            if len(pile) > 0:
+                for target in tableau_wants.get(pile[-1], ()):
+                    moves.append((MOVE, pile[-1], target))
+
+        return moves
+
+    def foundation_for(self, card):
+        """ The foundation card can go straight up to, or None """
+        for pile_index in range(TOP_PILE_1, TOP_PILE_4 + 1):
+            if self.can_move(card, pile_index):
+                return pile_index
+        return None
+
+    def all_face_up(self):
+        """ Are all the play piles' cards face up, leaving nothing hidden but the stock? """
+        face_up = self.face_up
+        return all(face_up[card] for pile in self.piles[PLAY_PILE_1:PLAY_PILE_7 + 1] for card in pile)
+
+    def finish_moves(self):
+        """
+        The moves that play out the end game: every card goes up to the
+        foundations, drawing through the stock when nothing else can go.
+        Returns None if that gets stuck, and the game needs moves between
+        the play piles first.
+
+        The foundations' next cards are kept in a dict that each move updates,
+        so finding a card a home is a lookup, not a scan of the foundations.
+        """
+        game = self.copy()
+        piles = game.piles
+        stock = piles[BOTTOM_FACE_DOWN_PILE]
+        waste = piles[BOTTOM_FACE_UP_PILE]
+
+        # Card number -> the foundation waiting for it, and the empty ones aces go to
+        wants = {}
+        empty = []
+        for pile_index in range(TOP_PILE_1, TOP_PILE_4 + 1):
+            pile = piles[pile_index]
+            if len(pile) == 0:
+                empty.append(pile_index)
+            else:
+                rank = game.foundation_next_rank(pile_index)
+                if rank is not None:
+                    wants[pile[0] + rank] = pile_index
+        empty.reverse()
+
+        moves = []
+        # Passes through the stock since a card last went up
+        idle_recycles = 0
+        while not game.is_won():
+            for pile_index in (BOTTOM_FACE_UP_PILE, *range(PLAY_PILE_1, PLAY_PILE_7 + 1)):
+                pile = piles[pile_index]
+                if len(pile) == 0 or not game.face_up[pile[-1]]:
+                    continue
+                card = pile[-1]
+                if RANK[card] == 0 and empty:
+                    target = empty.pop()
+                elif card in wants:
+                    target = wants.pop(card)
+                else:
+                    continue
+                if RANK[card] < KING:
+                    wants[card + 1] = target
+                game._relocate(card, target)
+                moves.append((MOVE, card, target))
+                idle_recycles = 0
+                break
+            else:
+                # Nothing on top can go up, so turn over more of the stock
+                if len(stock) > 0:
+                    game.draw_stock()
+                    moves.append((DRAW, -1, BOTTOM_FACE_UP_PILE))
+                elif len(waste) > 0 and idle_recycles == 0:
+                    game.recycle_stock()
+                    moves.append((RECYCLE, -1, BOTTOM_FACE_DOWN_PILE))
+                    idle_recycles += 1
+                else:
+                    return None
+        return moves
+
+    def move(self, card, pile_index):
+        """ Move card and the cards on top of it to a new pile. """
+        if not self.can_move(card, pile_index):
+            return False
+        self._relocate(card, pile_index)
+        return True
+
+    def _relocate(self, card, pile_index):
+        """ Move card and the cards on top of it, whatever the rules say """
+        source_index = self.pile_of[card]
+        source = self.piles[source_index]
+        target = self.piles[pile_index]
+        depth = self.depth_of[card]
+        for moved in source[depth:]:
+            self.pile_of[moved] = pile_index
+            self.depth_of[moved] = len(target)
+            target.append(moved)
+            if TOP_PILE_1 <= pile_index <= TOP_PILE_4:
+                self._foundation_added(pile_index, moved)
+        del source[depth:]
+        if TOP_PILE_1 <= source_index <= TOP_PILE_4:
+            self._foundation_trimmed(source_index)
+
+    def _foundation_added(self, pile_index, card):
+        """ Update the foundation counts after card lands on a foundation """
+        foundation = pile_index - TOP_PILE_1
+        built = self.foundation_built[foundation]
+        pile = self.piles[pile_index]
+        # Does it carry on an unbroken run from the ace?
+        if built == len(pile) - 1 and RANK[card] == built and SUIT[card] == SUIT[pile[0]]:
+            self.foundation_built[foundation] = built + 1
+            if built + 1 == len(CARD_VALUES):
+                self.complete_foundations += 1
+
+    def _foundation_trimmed(self, pile_index):
+        """ Update the foundation counts after cards leave a foundation """
+        foundation = pile_index - TOP_PILE_1
+        remaining = len(self.piles[pile_index])
+        if self.foundation_built[foundation] > remaining:
+            if self.foundation_built[foundation] == len(CARD_VALUES):
+                self.complete_foundations -= 1
+            self.foundation_built[foundation] = remaining
+
+    def apply(self, move):
+        """ Make a (kind, card, pile index) move. Returns True if it could be made. """
+        kind, card, pile_index = move
+        if kind == DRAW:
+            return len(self.draw_stock()) > 0
+        if kind == RECYCLE:
+            return len(self.recycle_stock()) > 0
+        if kind == FLIP:
+            return self.flip(card)
+        return self.move(card, pile_index)
+
+    def unapply(self, move, source):
+        """
+        Take back a move that apply() made, in time proportional to the cards
+        it moved. source is what the move itself doesn't say: the pile a MOVE
+        came from, or how many cards a DRAW turned over.
+        """
+        kind, card, pile_index = move
+        stock = self.piles[BOTTOM_FACE_DOWN_PILE]
+        waste = self.piles[BOTTOM_FACE_UP_PILE]
+        if kind == DRAW:
+            # Turn the drawn cards back down onto the stock, last drawn first
+            for _ in range(source):
+                card = waste.pop()
+                self.face_up[card] = False
+                self.pile_of[card] = BOTTOM_FACE_DOWN_PILE
+                self.depth_of[card] = len(stock)
+                stock.append(card)
+        elif kind == RECYCLE:
+            # Turn the stock back over into the waste pile
+            unrecycled = stock[::-1]
+            for depth, card in enumerate(unrecycled):
+                self.face_up[card] = True
+                self.pile_of[card] = BOTTOM_FACE_UP_PILE
+                self.depth_of[card] = depth
+            waste.extend(unrecycled)
+            stock.clear()
+        elif kind == FLIP:
+            self.face_up[card] = False
+        else:
+            self._relocate(card, source)
+
+    def is_won(self):
+        """ Are all four foundations complete, ace to king in one suit? """
+        return self.complete_foundations == TOP_PILE_4 - TOP_PILE_1 + 1
+
+    def foundation_next_rank(self, pile_index):
+        """ Rank the foundation needs next to carry on its run, or None if the run is broken """
+        pile = self.piles[pile_index]
+        built = self.foundation_built[pile_index - TOP_PILE_1]
+        if built != len(pile) or built == len(CARD_VALUES):
+            return None
+        return built
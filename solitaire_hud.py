@@ -0,0 +1,90 @@
+"""
+Text drawn over the solitaire table.
+
+Every string is a pyglet label that lives as long as the window, and all of
+them share one batch, so the whole HUD is a single draw. A label is only laid
+out again when its text actually changes, which for most of them is never.
+"""
+from itertools import zip_longest
+
+import arcade
+import pyglet
+
+from solitaire_layout import SCREEN_WIDTH, SCREEN_HEIGHT
+
+# Font draw_text uses by default
+HUD_FONT = ("calibri", "arial")
+
+# Fixed width, so the overlay's columns line up
+PROFILE_FONT = ("consolas", "courier new", "monospace")
+PROFILE_LINE_SPACING = 14
+
+HELP_LINES = [
+    "'R': restart the game, 'Space': skip the music, 'H': hint",
+    "'D': turn on/off music, 'C': change background color",
+    "'Z': undo, 'Y': redo, 'S': save a replay",
+    "'F': finish the game, double-click: card to its foundation",
+]
+
+
+def help_line_y(line_no):
+    """ Baseline of a help line. They stack up from the bottom of the screen. """
+    return 18 + 30 * (len(HELP_LINES) - 1 - line_no)
+
+
+class Hud:
+    """ Timer, deal number, hint, win/lose banner and help text """
+
+    def __init__(self):
+        self.batch = pyglet.graphics.Batch()
+
+        # Remaining time in the top-right corner, then the hint and deal number
+        self.timer = self._label(SCREEN_WIDTH - 10, SCREEN_HEIGHT - 30, 18, anchor_x="right")
+        self.hint = self._label(SCREEN_WIDTH - 10, SCREEN_HEIGHT - 60, 14, anchor_x="right")
+        self.deal = self._label(SCREEN_WIDTH - 10, SCREEN_HEIGHT - 90, 14, anchor_x="right")
+
+        # Won or lost message across the middle
+        self.banner = self._label(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, 36, arcade.color.BLACK, anchor_x="center")
+
+        # Help at the bottom never changes
+        self.help = [self._label(SCREEN_WIDTH - 5, help_line_y(i), 18, anchor_x="right", text=line)
+                     for i, line in enumerate(HELP_LINES)]
+
+        # Profiler percentiles under the deal number, one label per line,
+        # made as the lines appear
+        self.profile = []
+
+        # Whole seconds the timer label shows, so it's only formatted once a second
+        self.shown_seconds = None
+
+    def _label(self, x, y, font_size, color=arcade.color.WHITE, anchor_x="left", text="", font_name=HUD_FONT):
+        return pyglet.text.Label(text, x=x, y=y, font_name=font_name, font_size=font_size,
+                                 color=(*color[:3], 255), anchor_x=anchor_x, anchor_y="baseline",
+                                 batch=self.batch)
+
+    @staticmethod
+    def set_text(label, text):
+        """ Change a label's text, skipping the relayout if it's the same """
+        if label.text != text:
+            label.text = text
+
+    def show_time(self, remaining_seconds):
+        """ Show the time left, given in whole seconds """
+        if remaining_seconds == self.shown_seconds:
+            return
+        self.shown_seconds = remaining_seconds
+        minutes, seconds = divmod(remaining_seconds, 60)
+        self.set_text(self.timer, f"Time: {minutes:02}:{seconds:02}")
+
+    def show_profile(self, lines):
+        """ Show the profiler overlay's lines """
+        while len(self.profile) < len(lines):
+            y = SCREEN_HEIGHT - 110 - PROFILE_LINE_SPACING * len(self.profile)
+            self.profile.append(self._label(SCREEN_WIDTH - 10, y, 10, anchor_x="right", font_name=PROFILE_FONT))
+        for label, text in zip_longest(self.profile, lines, fillvalue=""):
+            self.set_text(label, text)
+
+    def draw(self):
+        """ Draw all the text in one go """
+        with arcade.get_window().ctx.pyglet_rendering():
+            self.batch.draw()
@@ -0,0 +1,159 @@
+"""
+Where the piles and cards of a solitaire table go on screen.
+
+The table is a fixed grid, so a point can be mapped straight to the pile and
+card under it without looking at any sprites.
+"""
+import math
+
+from solitaire_core import (
+    PILE_COUNT, BOTTOM_FACE_DOWN_PILE, BOTTOM_FACE_UP_PILE, PLAY_PILE_1, PLAY_PILE_7, TOP_PILE_1, TOP_PILE_4,
+)
+
+# Screen title and size
+SCREEN_WIDTH = 1024
+SCREEN_HEIGHT = 768
+SCREEN_TITLE = "Solitaire"
+
+# Constants for sizing
+CARD_SCALE = 0.6
+
+# How big are the cards?
+CARD_WIDTH = 140 * CARD_SCALE
+CARD_HEIGHT = 190 * CARD_SCALE
+
+# How big is the mat we'll place the card on?
+MAT_PERCENT_OVERSIZE = 1.25
+MAT_HEIGHT = int(CARD_HEIGHT * MAT_PERCENT_OVERSIZE)
+MAT_WIDTH = int(CARD_WIDTH * MAT_PERCENT_OVERSIZE)
+
+# How much space do we leave as a gap between the mats?
+# Done as a percent of the mat size.
+VERTICAL_MARGIN_PERCENT = 0.10
+HORIZONTAL_MARGIN_PERCENT = 0.10
+
+# The Y of the bottom row (2 piles)
+BOTTOM_Y = MAT_HEIGHT / 2 + MAT_HEIGHT * VERTICAL_MARGIN_PERCENT
+
+# The X of where to start putting things on the left side
+START_X = MAT_WIDTH / 2 + MAT_WIDTH * HORIZONTAL_MARGIN_PERCENT
+
+# The Y of the top row (4 piles)
+TOP_Y = SCREEN_HEIGHT - MAT_HEIGHT / 2 - MAT_HEIGHT * VERTICAL_MARGIN_PERCENT
+
+# The Y of the middle row (7 piles)
+MIDDLE_Y = TOP_Y - MAT_HEIGHT - MAT_HEIGHT * VERTICAL_MARGIN_PERCENT
+
+# How far apart each pile goes
+X_SPACING = MAT_WIDTH + MAT_WIDTH * HORIZONTAL_MARGIN_PERCENT
+
+# If we fan our cards stacked on each other, how far apart to fan them?
+CARD_VERTICAL_OFFSET = CARD_HEIGHT * CARD_SCALE * 0.3
+
+
+class TableLayout:
+    """
+    Geometry of one table, with its bottom-left corner at (origin_x, origin_y).
+
+    Cards in the middle play piles fan down by CARD_VERTICAL_OFFSET per card;
+    every other pile stacks its cards on the mat.
+    """
+
+    def __init__(self, origin_x=0.0, origin_y=0.0):
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+
+        # Centre of each pile's mat, indexed by pile
+        self.pile_positions = [None] * PILE_COUNT
+        self.pile_positions[BOTTOM_FACE_DOWN_PILE] = origin_x + START_X, origin_y + BOTTOM_Y
+        self.pile_positions[BOTTOM_FACE_UP_PILE] = origin_x + START_X + X_SPACING, origin_y + BOTTOM_Y
+        for i in range(7):
+            self.pile_positions[PLAY_PILE_1 + i] = origin_x + START_X + i * X_SPACING, origin_y + MIDDLE_Y
+        for i in range(4):
+            self.pile_positions[TOP_PILE_1 + i] = origin_x + START_X + i * X_SPACING, origin_y + TOP_Y
+
+    def card_position(self, pile_index, depth):
+        """ Where the card at depth (0 = bottom) of a pile sits """
+        x, y = self.pile_positions[pile_index]
+        if PLAY_PILE_1 <= pile_index <= PLAY_PILE_7:
+            return x, y - CARD_VERTICAL_OFFSET * depth
+        return x, y
+
+    def _column(self, x):
+        """ Nearest column to x, and how far x is from its centre """
+        column = round((x - self.origin_x - START_X) / X_SPACING)
+        return column, abs(x - self.origin_x - START_X - column * X_SPACING)
+
+    def _pile_in_row(self, column, y):
+        """ Which pile's mat row is y closest to, in this column? """
+        row_y = y - self.origin_y
+        rows = ((abs(row_y - TOP_Y), TOP_PILE_1, TOP_PILE_4),
+                (abs(row_y - MIDDLE_Y), PLAY_PILE_1, PLAY_PILE_7),
+                (abs(row_y - BOTTOM_Y), BOTTOM_FACE_DOWN_PILE, BOTTOM_FACE_UP_PILE))
+        for _, first, last in sorted(rows):
+            if first + column <= last:
+                return first + column
+        return None
+
+    def _fanned_card_at(self, pile_index, pile_size, y):
+        """ Depth of the top-most fanned card covering y, or None """
+        top_y = self.pile_positions[pile_index][1]
+        depth = min(pile_size - 1, math.floor((top_y - y + CARD_HEIGHT / 2) / CARD_VERTICAL_OFFSET))
+        if depth < 0 or top_y - CARD_VERTICAL_OFFSET * depth - CARD_HEIGHT / 2 > y:
+            return None
+        return depth
+
+    def hit_test(self, x, y, piles):
+        """
+        What is under the point (x, y)?
+
+        Returns (pile index, depth) for a card, (pile index, None) for the
+        bare part of a mat, or None. piles only needs to support len() of
+        each pile.
+        """
+        column, dx = self._column(x)
+        if column < 0 or dx > MAT_WIDTH / 2:
+            return None
+
+        # Fanned play piles can reach down over the bottom row, so try them first
+        pile_index = PLAY_PILE_1 + column
+        if pile_index <= PLAY_PILE_7 and dx <= CARD_WIDTH / 2 and len(piles[pile_index]) > 0:
+            depth = self._fanned_card_at(pile_index, len(piles[pile_index]), y)
+            if depth is not None:
+                return pile_index, depth
+
+        pile_index = self._pile_in_row(column, y)
+        if pile_index is None:
+            return None
+        _, pile_y = self.pile_positions[pile_index]
+        if abs(y - pile_y) > MAT_HEIGHT / 2:
+            return None
+        if dx <= CARD_WIDTH / 2 and abs(y - pile_y) <= CARD_HEIGHT / 2 and len(piles[pile_index]) > 0:
+            return pile_index, len(piles[pile_index]) - 1
+        return pile_index, None
+
+    def drop_target(self, x, y, piles):
+        """
+        Which pile does a card centred on (x, y) land on?
+
+        The closest pile counts if the card overlaps its mat, or the last
+        card fanned out on it. Returns None if it touches neither.
+        """
+        column, dx = self._column(x)
+        if column < 0:
+            return None
+
+        # Fanned play piles can reach down near the bottom row, so try them first
+        pile_index = PLAY_PILE_1 + column
+        if pile_index <= PLAY_PILE_7 and len(piles[pile_index]) > 0:
+            _, top_y = self.card_position(pile_index, len(piles[pile_index]) - 1)
+            if dx < CARD_WIDTH and abs(y - top_y) < CARD_HEIGHT:
+                return pile_index
+
+        pile_index = self._pile_in_row(column, y)
+        if pile_index is None:
+            return None
+        _, pile_y = self.pile_positions[pile_index]
+        if dx < (MAT_WIDTH + CARD_WIDTH) / 2 and abs(y - pile_y) < (MAT_HEIGHT + CARD_HEIGHT) / 2:
+            return pile_index
+        return None
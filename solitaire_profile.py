@@ -0,0 +1,196 @@
+"""
+Opt-in frame profiling for solitaire.
+
+MyGame wraps its hot paths in profiler.section(name). Each frame's time per
+section goes into a fixed-size ring buffer, so percentiles over the last few
+seconds are always at hand for the overlay, and every timed span is kept for
+dumping as a Chrome trace (load it in chrome://tracing or Perfetto).
+
+    python solitaire.py --profile
+
+StartupReport times the steps from launch to the first deal being played.
+"""
+import array
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Frames of history kept per section
+PROFILE_FRAMES = 600
+
+# Percentiles the overlay shows
+OVERLAY_PERCENTILES = (50, 95, 99)
+
+
+class RingBuffer:
+    """ The last size samples of one series """
+
+    __slots__ = ("samples", "count", "next")
+
+    def __init__(self, size):
+        self.samples = array.array("d", bytes(8 * size))
+        self.count = 0
+        self.next = 0
+
+    def add(self, value):
+        self.samples[self.next] = value
+        self.next = (self.next + 1) % len(self.samples)
+        self.count = min(self.count + 1, len(self.samples))
+
+    def percentiles(self, percents):
+        """ Nearest-rank percentiles of the samples held, or None if there are none """
+        if self.count == 0:
+            return None
+        ordered = sorted(self.samples[:self.count])
+        return [ordered[min(self.count - 1, self.count * percent // 100)] for percent in percents]
+
+
+class _Section:
+    """ Times one with-block into a profiler """
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_span(self.name, self.start, time.perf_counter())
+
+
+class _NoSection:
+    """ A with-block that does nothing, for when profiling is off """
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FrameProfiler:
+    """ Per-frame section timings, input latency, and a trace of recent spans """
+
+    enabled = True
+
+    def __init__(self, frames=PROFILE_FRAMES):
+        self.frames = frames
+        # Section name -> seconds per frame
+        self.series = {}
+        # Section name -> seconds so far this frame
+        self.frame_totals = {}
+        # (name, start, end) of recent spans, for the trace
+        self.spans = deque(maxlen=frames * 8)
+        # When the first input of this frame arrived, for input latency
+        self.input_time = None
+        self.frame_start = time.perf_counter()
+
+    def section(self, name):
+        """ A with-block that adds its time to section name """
+        return _Section(self, name)
+
+    def add_span(self, name, start, end):
+        self.frame_totals[name] = self.frame_totals.get(name, 0.0) + end - start
+        self.spans.append((name, start, end))
+
+    def input_event(self):
+        """ Note that input arrived; the next finished frame is when it shows """
+        if self.input_time is None:
+            self.input_time = time.perf_counter()
+
+    def _series(self, name):
+        if name not in self.series:
+            self.series[name] = RingBuffer(self.frames)
+        return self.series[name]
+
+    def end_frame(self):
+        """ Close off this frame's timings. Call once the frame is drawn. """
+        now = time.perf_counter()
+        for name, seconds in self.frame_totals.items():
+            self._series(name).add(seconds)
+        self.frame_totals.clear()
+        self._series("frame").add(now - self.frame_start)
+        self.spans.append(("frame", self.frame_start, now))
+        self.frame_start = now
+        if self.input_time is not None:
+            self._series("input latency").add(now - self.input_time)
+            self.input_time = None
+
+    def overlay_lines(self):
+        """ One line of millisecond percentiles per section """
+        header = " ".join(f"p{percent:<5}" for percent in OVERLAY_PERCENTILES)
+        lines = [f"{'ms':<14}{header}"]
+        for name, series in self.series.items():
+            values = series.percentiles(OVERLAY_PERCENTILES)
+            if values is not None:
+                lines.append(f"{name:<14}" + " ".join(f"{value * 1000:<6.2f}" for value in values))
+        return lines
+
+    def dump_trace(self, path):
+        """ Write the recent spans as a Chrome trace event file """
+        pid = os.getpid()
+        tid = threading.get_ident()
+        events = [{"name": name, "ph": "X", "ts": start * 1e6, "dur": (end - start) * 1e6, "pid": pid, "tid": tid}
+                  for name, start, end in self.spans]
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        return len(events)
+
+
+class StartupReport:
+    """ How long each step of startup took, from a start time up to the game being ready """
+
+    def __init__(self, start):
+        self.start = start
+        self.last = start
+        # Step name -> seconds, in the order they happened
+        self.steps = {}
+
+    def mark(self, name, seconds=None):
+        """ Note that a step just finished, or took seconds off to one side """
+        now = time.perf_counter()
+        if seconds is None:
+            seconds = now - self.last
+            self.last = now
+        self.steps[name] = seconds
+
+    @property
+    def total(self):
+        """ Seconds from the start to the last step """
+        return self.last - self.start
+
+    def lines(self):
+        return [f"{name:<14}{seconds * 1000:8.1f} ms" for name, seconds in self.steps.items()] + \
+            [f"{'total':<14}{self.total * 1000:8.1f} ms"]
+
+    def save(self, path):
+        """ Write the steps, and the total, as JSON seconds """
+        with open(path, "w") as file:
+            json.dump({**self.steps, "total": self.total}, file, indent=2)
+
+
+class NullProfiler:
+    """ Same interface as FrameProfiler, costing next to nothing """
+
+    enabled = False
+    _section = _NoSection()
+
+    def section(self, name):
+        return self._section
+
+    def input_event(self):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def overlay_lines(self):
+        return []
+
+    def dump_trace(self, path):
+        return 0
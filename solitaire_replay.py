@@ -0,0 +1,194 @@
+"""
+Move logs and replay files for solitaire.
+
+Every change to a game is one 16-bit record: the move's kind, card and pile,
+plus what it takes to undo it. A MoveLog keeps them in order for undo and
+redo, and a replay file is just a deal seed followed by the records, so a
+game can be streamed back headless at full speed.
+
+    python solitaire_replay.py replays/deal-1234.solr
+"""
+import argparse
+import array
+import struct
+import sys
+import time
+
+from solitaire_core import DRAW_COUNT, DRAW, MOVE, BOTTOM_FACE_DOWN_PILE, Klondike
+
+# Replay file header: magic, then the deal seed as a little-endian u32
+REPLAY_MAGIC = b"SOLR"
+REPLAY_HEADER = struct.Struct("<4sI")
+
+# Records read from a replay file at a time when streaming it
+REPLAY_CHUNK = 4096
+
+# Card field value for moves that don't name a card (DRAW and RECYCLE)
+NO_CARD = 0x3F
+
+
+def encode_move(move, source):
+    """
+    Pack a move and its undo information into a u16:
+    kind (2 bits), card (6), pile (4), source (4).
+    """
+    kind, card, pile_index = move
+    if card < 0:
+        card = NO_CARD
+    return kind << 14 | card << 8 | pile_index << 4 | source
+
+
+def decode_move(record):
+    """ Unpack a u16 record into (move, source) """
+    card = record >> 8 & 0x3F
+    if card == NO_CARD:
+        card = -1
+    return (record >> 14, card, record >> 4 & 0xF), record & 0xF
+
+
+def undo_source(game, move):
+    """ What it will take to undo move in game, before it's made """
+    kind, card, pile_index = move
+    if kind == MOVE:
+        return game.pile_index_of(card)
+    if kind == DRAW:
+        return min(DRAW_COUNT, len(game.piles[BOTTOM_FACE_DOWN_PILE]))
+    return 0
+
+
+class MoveLog:
+    """
+    The moves made in one deal, in order, as packed records.
+
+    Records past position have been undone and can be redone, until a new
+    move replaces them.
+    """
+
+    def __init__(self, seed=None):
+        self.seed = seed
+        self.records = array.array("H")
+        self.position = 0
+
+    def clear(self, seed):
+        """ Start the log of a new deal """
+        self.seed = seed
+        del self.records[:]
+        self.position = 0
+
+    def load(self, seed, records):
+        """ Pick up a saved log of a deal, with every record in it made """
+        self.clear(seed)
+        self.records.extend(records)
+        self.position = len(self.records)
+
+    def record(self, move, source):
+        """ Log a move that has just been made, dropping anything there was to redo """
+        del self.records[self.position:]
+        self.records.append(encode_move(move, source))
+        self.position += 1
+
+    def apply(self, game, move):
+        """ Make move in game and log it. Returns True if it could be made. """
+        source = undo_source(game, move)
+        if not game.apply(move):
+            return False
+        self.record(move, source)
+        return True
+
+    @property
+    def can_undo(self):
+        return self.position > 0
+
+    @property
+    def can_redo(self):
+        return self.position < len(self.records)
+
+    def undo(self, game):
+        """ Take back the last move in game. Returns its (move, source), or None. """
+        if not self.can_undo:
+            return None
+        self.position -= 1
+        move, source = decode_move(self.records[self.position])
+        game.unapply(move, source)
+        return move, source
+
+    def redo(self, game):
+        """ Make the last undone move again. Returns its (move, source), or None. """
+        if not self.can_redo:
+            return None
+        move, source = decode_move(self.records[self.position])
+        game.apply(move)
+        self.position += 1
+        return move, source
+
+    def moves(self):
+        """ The moves that got the game where it is, oldest first """
+        return [decode_move(record)[0] for record in self.records[:self.position]]
+
+    def save(self, path):
+        """ Write the seed and the moves made so far as a replay file """
+        with open(path, "wb") as file:
+            file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, self.seed))
+            records = self.records[:self.position]
+            if sys.byteorder != "little":
+                records.byteswap()
+            records.tofile(file)
+
+
+def read_replay(file):
+    """
+    Read a replay file opened in binary mode. Returns its seed and a
+    generator of (move, source) that reads the records in chunks.
+    """
+    magic, seed = REPLAY_HEADER.unpack(file.read(REPLAY_HEADER.size))
+    if magic != REPLAY_MAGIC:
+        raise ValueError(f"{file.name} is not a solitaire replay")
+
+    def moves():
+        while True:
+            data = file.read(REPLAY_CHUNK * 2)
+            if not data:
+                return
+            records = array.array("H", data)
+            if sys.byteorder != "little":
+                records.byteswap()
+            for record in records:
+                yield decode_move(record)
+
+    return seed, moves()
+
+
+def replay(path):
+    """
+    Deal a replay file's seed and make all its moves headless. Returns the
+    game, and how many moves were made. Raises ValueError at the first
+    move that can't be made.
+    """
+    with open(path, "rb") as file:
+        seed, moves = read_replay(file)
+        game = Klondike()
+        game.deal(seed)
+        count = 0
+        for move, _ in moves:
+            if not game.apply(move):
+                raise ValueError(f"{path}: move {count} {move} can't be made")
+            count += 1
+    return game, count
+
+
+def main():
+    """ Main function """
+    parser = argparse.ArgumentParser(description="Play solitaire replay files back headless.")
+    parser.add_argument("paths", nargs="+", help="replay files")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        start = time.perf_counter()
+        game, count = replay(path)
+        elapsed = time.perf_counter() - start
+        print(f"{path}: deal {game.seed}, {count} moves, {'won' if game.is_won() else 'not won'} "
+              f"({count / max(elapsed, 1e-9):.0f} moves/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Save file for a game in progress.
+
+The file is memory-mapped and laid out at fixed offsets: a header, one u16
+per card (pile, depth and face-up flag), then the move log as u16 records.
+Each move only rewrites the few cards and the log record it changed, so
+saving costs a handful of small memory writes and never stalls a frame.
+
+    header:  magic "SOLS", version u8, 3 pad bytes, seed u32,
+             elapsed time f64, track index u16, 2 pad bytes, log length u32
+    cards:   52 x u16, card number order: pile << 7 | depth << 1 | face up
+    log:     u16 move records, see solitaire_replay
+"""
+import array
+import mmap
+import os
+import struct
+import sys
+from collections import namedtuple
+
+from solitaire_core import CARD_COUNT, PILE_COUNT
+
+SNAPSHOT_MAGIC = b"SOLS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sB3xIdH2xI")
+
+# Offsets of the parts of the header that change during a game
+ELAPSED_OFFSET = 12
+LOG_LENGTH_OFFSET = 24
+
+CARDS_OFFSET = SNAPSHOT_HEADER.size
+LOG_OFFSET = CARDS_OFFSET + CARD_COUNT * 2
+
+# Room for this many log records when the file is created; it doubles as needed
+LOG_CAPACITY = 1024
+
+# A game read back from a save file
+SavedGame = namedtuple("SavedGame", "seed elapsed track piles face_up records")
+
+
+def pack_card(pile_index, depth, face_up):
+    return pile_index << 7 | depth << 1 | face_up
+
+
+class Snapshot:
+    """ A save file kept up to date as the game is played """
+
+    def __init__(self, path):
+        self.path = path
+        mode = "r+b" if os.path.exists(path) else "w+b"
+        self.file = open(path, mode)
+        self.map = None
+        self._map_file(max(os.fstat(self.file.fileno()).st_size, LOG_OFFSET + LOG_CAPACITY * 2))
+
+    def _map_file(self, size):
+        if self.map is not None:
+            self.map.close()
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def start(self, game, log, elapsed, track):
+        """ Write the whole state, for a new or resumed game """
+        self.map[:SNAPSHOT_HEADER.size] = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, game.seed,
+                                                               elapsed, track, 0)
+        self.cards_moved(game, range(CARD_COUNT))
+        for index in range(log.position):
+            self._write_record(log, index)
+        struct.pack_into("<I", self.map, LOG_LENGTH_OFFSET, log.position)
+
+    def cards_moved(self, game, cards):
+        """ Write where these cards are now """
+        for card in cards:
+            struct.pack_into("<H", self.map, CARDS_OFFSET + card * 2,
+                             pack_card(game.pile_of[card], game.depth_of[card], game.face_up[card]))
+
+    def _write_record(self, log, index):
+        offset = LOG_OFFSET + index * 2
+        if offset + 2 > len(self.map):
+            self._map_file(len(self.map) * 2)
+        struct.pack_into("<H", self.map, offset, log.records[index])
+
+    def update(self, game, log, cards):
+        """ A move, undo or redo just changed these cards, and the log """
+        self.cards_moved(game, cards)
+        # The newest record is the only one that can be new. Undone records
+        # stay in the file past the log length, ready for a redo.
+        if log.position:
+            self._write_record(log, log.position - 1)
+        struct.pack_into("<I", self.map, LOG_LENGTH_OFFSET, log.position)
+
+    def tick(self, elapsed, track):
+        """ Keep the clock and music track up to date """
+        struct.pack_into("<dH", self.map, ELAPSED_OFFSET, elapsed, track)
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+
+def load_snapshot(path):
+    """ Read a save file back. Returns a SavedGame, or None if there's no usable save. """
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError:
+        return None
+    if len(data) < LOG_OFFSET:
+        return None
+    magic, version, seed, elapsed, track, log_length = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or len(data) < LOG_OFFSET + log_length * 2:
+        print(f"Ignoring {path}: not a save file this version can read")
+        return None
+
+    cards = array.array("H", data[CARDS_OFFSET:LOG_OFFSET])
+    records = array.array("H", data[LOG_OFFSET:LOG_OFFSET + log_length * 2])
+    if sys.byteorder != "little":
+        cards.byteswap()
+        records.byteswap()
+
+    # Put every card back at its depth in its pile
+    piles = [[] for _ in range(PILE_COUNT)]
+    face_up = []
+    for card, packed in enumerate(cards):
+        pile_index, depth = packed >> 7, packed >> 1 & 0x3F
+        if pile_index >= PILE_COUNT:
+            return None
+        piles[pile_index].append((depth, card))
+        if packed & 1:
+            face_up.append(card)
+    for pile_index, pile in enumerate(piles):
+        pile.sort()
+        if [depth for depth, _ in pile] != list(range(len(pile))):
+            print(f"Ignoring {path}: the piles don't add up")
+            return None
+        piles[pile_index] = [card for _, card in pile]
+
+    return SavedGame(seed, elapsed, track, piles, face_up, records)
@@ -0,0 +1,378 @@
+"""
+Solver for the draw-three solitaire in solitaire.py.
+
+It searches depth first over standard Klondike moves: runs of alternating
+colour down the play piles, kings to empty piles, and suits up the
+foundations from the ace. Those are the game's own rules, so any solution
+found can be played move for move.
+
+Run it on a batch of deals with `python solitaire_solver.py --games 100`.
+"""
+import argparse
+import time
+
+from solitaire_core import (
+    CARD_SUITS, BOTTOM_FACE_DOWN_PILE, BOTTOM_FACE_UP_PILE, PLAY_PILE_1, PLAY_PILE_7, TOP_PILE_1, TOP_PILE_4,
+    DRAW_COUNT, KING, RANK, SUIT, COLOR, DRAW, RECYCLE, FLIP, MOVE, SEED_LIMIT, Klondike, card_name, make_card,
+)
+
+# What the solver can say about a game
+WON = "won"
+LOST = "lost"
+UNKNOWN = "unknown"
+
+# Default limits for one game
+TIME_BUDGET = 1.0
+MAX_ENTRIES = 500_000
+
+TABLEAU = range(PLAY_PILE_1, PLAY_PILE_7 + 1)
+FOUNDATIONS = range(TOP_PILE_1, TOP_PILE_4 + 1)
+
+
+class SolveResult:
+    """ What the solver found out about a game, and how hard it looked """
+
+    __slots__ = ("status", "moves", "nodes", "elapsed")
+
+    def __init__(self, status, moves, nodes, elapsed):
+        # WON, LOST, or UNKNOWN if the budget ran out first
+        self.status = status
+        # For WON, the moves that win from the state given
+        self.moves = moves
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return f"SolveResult({self.status}, {len(self.moves)} moves, {self.nodes} nodes, {self.elapsed:.3f}s)"
+
+
+class TranspositionTable:
+    """
+    Keys of states that have been searched already, holding at most
+    max_entries. When full, the oldest half is forgotten; those states may
+    get searched again, but nothing wrong is ever remembered.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, key):
+        if len(self.entries) >= self.max_entries:
+            keep = len(self.entries) // 2
+            self.evictions += len(self.entries) - keep
+            entries = iter(self.entries)
+            for _ in range(len(self.entries) - keep):
+                next(entries)
+            self.entries = dict.fromkeys(entries)
+        self.entries[key] = None
+
+
+def state_key(game):
+    """
+    Compact, hashable key for a game state. The order of the play piles, and
+    of the foundations, doesn't matter to the outcome, so both are sorted.
+    """
+    face_up = game.face_up
+    piles = game.piles
+    tableau = sorted(bytes([card | face_up[card] << 6 for card in piles[i]]) for i in TABLEAU)
+    foundations = sorted(bytes(piles[i]) for i in FOUNDATIONS)
+    return b"\xff".join([bytes(piles[BOTTOM_FACE_DOWN_PILE]), bytes(piles[BOTTOM_FACE_UP_PILE]),
+                         *tableau, *foundations])
+
+
+def foundation_wants(game):
+    """
+    Which cards can go up to a foundation right now, as card number ->
+    foundation pile, and how far each suit has been built up.
+    """
+    wants = {}
+    built = [0] * len(CARD_SUITS)
+    empty_pile = None
+    for pile_index in FOUNDATIONS:
+        pile = game.piles[pile_index]
+        if len(pile) == 0:
+            if empty_pile is None:
+                empty_pile = pile_index
+            continue
+        rank = game.foundation_next_rank(pile_index)
+        if rank is not None:
+            # The run starts at the ace, and card numbers count up from it
+            wants[pile[0] + rank] = pile_index
+        if game.foundation_built[pile_index - TOP_PILE_1] > 0:
+            built[SUIT[pile[0]]] = game.foundation_built[pile_index - TOP_PILE_1]
+    if empty_pile is not None:
+        # Aces go on the first empty foundation
+        for suit in range(len(CARD_SUITS)):
+            if built[suit] == 0:
+                wants[make_card(suit, 0)] = empty_pile
+    return wants, built
+
+
+def is_safe_for_foundation(built, card):
+    """
+    Can sending card up never hurt? True for aces and twos, and for cards
+    whose two opposite-colour cards one rank down are already up.
+    """
+    rank = RANK[card]
+    suit = SUIT[card]
+    # Suits alternate colour, so the opposite colour is one suit either side
+    return rank <= 1 or (built[(suit + 1) % 4] >= rank and built[(suit + 3) % 4] >= rank)
+
+
+def settle(game, moves):
+    """
+    Make the moves there is never a reason not to make: turn over exposed
+    face-down cards and send up cards that are safe to. Appends them to moves.
+    """
+    changed = True
+    while changed:
+        changed = False
+        for pile_index in TABLEAU:
+            pile = game.piles[pile_index]
+            if len(pile) > 0 and not game.face_up[pile[-1]]:
+                game.flip(pile[-1])
+                moves.append((FLIP, pile[-1], pile_index))
+                changed = True
+        wants, built = foundation_wants(game)
+        for pile_index in (BOTTOM_FACE_UP_PILE, *TABLEAU):
+            pile = game.piles[pile_index]
+            if len(pile) > 0 and pile[-1] in wants and is_safe_for_foundation(built, pile[-1]):
+                moves.append((MOVE, pile[-1], wants[pile[-1]]))
+                game.move(pile[-1], wants[pile[-1]])
+                changed = True
+                break
+
+
+def stock_plays(game):
+    """
+    Every card the waste shows on top now or can be made to by dealing, as
+    (stock moves needed, card). Dealing and turning the waste back over
+    never change the order of stock and waste taken together, only how
+    many cards are in the waste, so this just walks that count round.
+    """
+    waste = game.piles[BOTTOM_FACE_UP_PILE]
+    cards = waste + game.piles[BOTTOM_FACE_DOWN_PILE][::-1]
+    in_waste = len(waste)
+    seen = {in_waste}
+    actions = []
+    plays = [([], cards[in_waste - 1])] if in_waste > 0 else []
+    while True:
+        if in_waste == len(cards):
+            actions = actions + [(RECYCLE, -1, BOTTOM_FACE_DOWN_PILE)]
+            in_waste = 0
+        else:
+            actions = actions + [(DRAW, -1, BOTTOM_FACE_UP_PILE)]
+            in_waste = min(in_waste + DRAW_COUNT, len(cards))
+        if in_waste in seen:
+            return plays
+        seen.add(in_waste)
+        if in_waste > 0:
+            plays.append((actions, cards[in_waste - 1]))
+
+
+def ordered_moves(game):
+    """
+    Every move worth trying from this state, most promising first. Each is
+    a list of moves, since playing a card from the stock takes some dealing
+    first. Runs are only split when that frees the card beneath.
+    """
+    piles = game.piles
+    face_up = game.face_up
+    wants, _ = foundation_wants(game)
+    scored = []
+
+    # Anything that can go up to a foundation
+    for pile_index in TABLEAU:
+        pile = piles[pile_index]
+        if len(pile) > 0 and pile[-1] in wants:
+            scored.append((100, [(MOVE, pile[-1], wants[pile[-1]])]))
+
+    # Where could a card of each rank and colour go in the play piles?
+    empty_pile = None
+    targets = {}
+    for pile_index in TABLEAU:
+        pile = piles[pile_index]
+        if len(pile) == 0:
+            if empty_pile is None:
+                empty_pile = pile_index
+        elif face_up[pile[-1]] and RANK[pile[-1]] > 0:
+            targets.setdefault((RANK[pile[-1]] - 1, 1 - COLOR[pile[-1]]), []).append(pile_index)
+
+    def play_pile_targets(card):
+        if RANK[card] == KING:
+            return [] if empty_pile is None else [empty_pile]
+        return targets.get((RANK[card], COLOR[card]), [])
+
+    # Is there a king that could use an empty pile? Stock and waste kings can
+    # always be dealt to; play pile kings only if something is under them.
+    king_waiting = any(RANK[card] == KING for card in piles[BOTTOM_FACE_DOWN_PILE]) \
+        or any(RANK[card] == KING for card in piles[BOTTOM_FACE_UP_PILE]) \
+        or any(len(piles[i]) > 1 and any(face_up[card] and RANK[card] == KING for card in piles[i][1:])
+               for i in TABLEAU)
+
+    # Runs between play piles
+    for pile_index in TABLEAU:
+        pile = piles[pile_index]
+        if len(pile) == 0 or not face_up[pile[-1]]:
+            continue
+        start = game.run_start(pile_index)
+        for depth in range(start, len(pile)):
+            card = pile[depth]
+            if depth == 0 and RANK[card] == KING:
+                # A king already at the bottom of a pile has nowhere better to be
+                continue
+            if depth == start and depth > 0 and not face_up[pile[depth - 1]]:
+                # Uncovers a face-down card, more so from deeper piles
+                score = 80 + depth
+            elif depth == 0:
+                # Emptying a pile only helps if there's a king to fill it
+                if not king_waiting:
+                    continue
+                score = 30
+            elif depth == start:
+                score = 20
+            elif pile[depth - 1] in wants:
+                # Frees the card beneath to go up
+                score = 60
+            else:
+                continue
+            for target in play_pile_targets(card):
+                if target != pile_index:
+                    scored.append((score, [(MOVE, card, target)]))
+
+    # Cards from the waste, now or after some dealing
+    for actions, card in stock_plays(game):
+        if card in wants:
+            scored.append((90 - len(actions), actions + [(MOVE, card, wants[card])]))
+        for target in play_pile_targets(card):
+            scored.append((50 - len(actions), actions + [(MOVE, card, target)]))
+
+    # Bringing a card back down from a foundation, as a last resort
+    for pile_index in FOUNDATIONS:
+        pile = piles[pile_index]
+        if len(pile) > 0:
+            for target in play_pile_targets(pile[-1]):
+                scored.append((-100, [(MOVE, pile[-1], target)]))
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [moves for _, moves in scored]
+
+
+class Solver:
+    """ Depth-first Klondike search with a bounded transposition table """
+
+    def __init__(self, time_budget=TIME_BUDGET, max_entries=MAX_ENTRIES):
+        self.time_budget = time_budget
+        self.max_entries = max_entries
+
+    def solve(self, game):
+        """ Try to win from game, which is left untouched. Returns a SolveResult. """
+        start = time.perf_counter()
+        deadline = start + self.time_budget
+        table = TranspositionTable(self.max_entries)
+        nodes = 0
+
+        root = game.copy()
+        root_moves = []
+        settle(root, root_moves)
+        if root.is_won():
+            return SolveResult(WON, root_moves, 1, time.perf_counter() - start)
+
+        root_key = state_key(root)
+        table.add(root_key)
+        # States on the current search path, which eviction must never forget
+        path = {root_key}
+        # Each frame: state, its untried moves, moves that led to it, its key
+        stack = [(root, iter(ordered_moves(root)), root_moves, root_key)]
+
+        while stack:
+            nodes += 1
+            if nodes & 255 == 0 and time.perf_counter() > deadline:
+                return SolveResult(UNKNOWN, [], nodes, time.perf_counter() - start)
+
+            state, untried, _, key = stack[-1]
+            for moves in untried:
+                child = state.copy()
+                for move in moves:
+                    child.apply(move)
+                child_moves = list(moves)
+                settle(child, child_moves)
+
+                if child.is_won():
+                    solution = [made for frame in stack for made in frame[2]] + child_moves
+                    return SolveResult(WON, solution, nodes, time.perf_counter() - start)
+
+                child_key = state_key(child)
+                if child_key in table or child_key in path:
+                    continue
+                table.add(child_key)
+                path.add(child_key)
+                stack.append((child, iter(ordered_moves(child)), child_moves, child_key))
+                break
+            else:
+                # Every move from here has been tried
+                stack.pop()
+                path.discard(key)
+
+        return SolveResult(LOST, [], nodes, time.perf_counter() - start)
+
+
+def solve_many(games, time_budget=TIME_BUDGET, max_entries=MAX_ENTRIES):
+    """ Solve each game in turn, yielding a SolveResult for each """
+    solver = Solver(time_budget, max_entries)
+    for game in games:
+        yield solver.solve(game)
+
+
+def describe_move(move):
+    """ A move in words, for hints """
+    kind, card, pile_index = move
+    if kind == DRAW:
+        return "Deal from the stock"
+    if kind == RECYCLE:
+        return "Turn the waste pile back over"
+    if kind == FLIP:
+        return f"Turn over the {card_name(card)}"
+    if TOP_PILE_1 <= pile_index <= TOP_PILE_4:
+        return f"Move the {card_name(card)} up to a foundation"
+    return f"Move the {card_name(card)} to play pile {pile_index - PLAY_PILE_1 + 1}"
+
+
+def main():
+    """ Main function """
+    parser = argparse.ArgumentParser(description="Find out which solitaire deals can be won.")
+    parser.add_argument("--games", type=int, default=100, help="how many deals to solve")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first deal")
+    parser.add_argument("--budget", type=float, default=TIME_BUDGET, help="seconds to spend on each deal")
+    parser.add_argument("--max-entries", type=int, default=MAX_ENTRIES, help="transposition table size")
+    args = parser.parse_args()
+    if args.games < 0 or not 0 <= args.seed <= args.seed + args.games <= SEED_LIMIT:
+        parser.error(f"--seed and --games must keep the deals from 0 to {SEED_LIMIT - 1}")
+
+    def deals():
+        for seed in range(args.seed, args.seed + args.games):
+            game = Klondike()
+            game.deal(seed)
+            yield game
+
+    counts = {WON: 0, LOST: 0, UNKNOWN: 0}
+    start = time.perf_counter()
+    for seed, result in enumerate(solve_many(deals(), args.budget, args.max_entries), args.seed):
+        counts[result.status] += 1
+        print(f"deal {seed}: {result}")
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.games} deals in {elapsed:.1f}s: {counts[WON]} won, {counts[LOST]} lost, "
+          f"{counts[UNKNOWN]} unknown")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Many solitaire tables in one window.
+
+Each table is an ordinary full-size table laid out at its own origin on a
+grid, and the view zooms out until the whole grid fits the window. Every
+table deals its own seed from a shared ladder and makes a few of its
+moves each frame; once it's won or stuck it deals the next seed up.
+
+A plan is a whole greedy game, too slow to work out in a frame when many
+tables finish together, so worker processes plan the next seeds of the
+ladder ahead of time. A finished table waits for the next seed's plan,
+showing its last position, and deals as soon as it's in.
+
+A table only holds its own game and plan, and a sprite for every place a
+card can be on it: each depth of each pile, up to the most cards the pile
+can ever hold. Those never move or change order. A move just shows the
+right texture in the places it filled and hides the ones it emptied, so
+it costs the same however many tables there are. Every table's places are
+in one sprite list, and the mats in another, so a frame is two draw calls
+from the window's one texture atlas.
+
+    python solitaire_tables.py --tables 16
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+
+import arcade
+
+from solitaire import CARD_TEXTURES
+from solitaire_batch import plan_greedy
+from solitaire_core import (
+    CARD_SUITS, CARD_VALUES, CARD_COUNT, PILE_COUNT, BOTTOM_FACE_DOWN_PILE, BOTTOM_FACE_UP_PILE,
+    PLAY_PILE_1, PLAY_PILE_7, DRAW, RECYCLE, FLIP, Klondike,
+)
+from solitaire_layout import SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, CARD_SCALE, MAT_WIDTH, MAT_HEIGHT, TableLayout
+from solitaire_solver import WON
+
+# Moves each table makes per frame
+TABLE_MOVES_PER_FRAME = 1
+
+# Seconds between updates of the totals in the title bar
+TITLE_INTERVAL = 1.0
+
+
+def pile_capacity(pile_index):
+    """ Most cards the pile can ever hold """
+    if pile_index in (BOTTOM_FACE_DOWN_PILE, BOTTOM_FACE_UP_PILE):
+        # Everything left after the deal
+        play_pile_count = PLAY_PILE_7 - PLAY_PILE_1 + 1
+        return CARD_COUNT - play_pile_count * (play_pile_count + 1) // 2
+    if PLAY_PILE_1 <= pile_index <= PLAY_PILE_7:
+        # The cards dealt face down under it, and a run from king to ace
+        return pile_index - PLAY_PILE_1 + len(CARD_VALUES)
+    return len(CARD_VALUES)
+
+
+def grid_size(table_count):
+    """ Columns and rows of the most nearly square grid that holds table_count tables """
+    columns = math.ceil(math.sqrt(table_count))
+    return columns, math.ceil(table_count / columns)
+
+
+class Table:
+    """ One table of the grid: its own game, the moves planned for it, and its card places """
+
+    def __init__(self, layout, faces):
+        self.layout = layout
+        # Face texture of each card number
+        self.faces = faces
+        self.game = Klondike()
+        self.plan = []
+        self.step = 0
+        self.status = None
+
+        # A hidden sprite for each place a card can go, per pile, bottom first.
+        # Places are hidden by shrinking them to nothing rather than making
+        # them transparent, so the GPU has no pixels to fill in for them.
+        self.places = []
+        for pile_index in range(PILE_COUNT):
+            places = []
+            for depth in range(pile_capacity(pile_index)):
+                place = arcade.Sprite(scale=0, hit_box_algorithm="None", texture=CARD_TEXTURES.back)
+                place.position = layout.card_position(pile_index, depth)
+                places.append(place)
+            self.places.append(places)
+        # How many places of each pile are showing a card
+        self.shown = [0] * PILE_COUNT
+
+    def deal(self, seed, status, plan):
+        """ Deal seed, to be played by the moves planned for it, and show it """
+        self.game.deal(seed)
+        self.status, self.plan = status, plan
+        self.step = 0
+        for pile_index in range(PILE_COUNT):
+            self.show(pile_index)
+
+    @property
+    def done(self):
+        return self.step == len(self.plan)
+
+    def play_next(self):
+        """ Make the next planned move and show what it changed """
+        move = self.plan[self.step]
+        self.step += 1
+        kind, card, pile_index = move
+        game = self.game
+        if kind == FLIP:
+            game.apply(move)
+            self.show(pile_index, game.depth_of[card])
+        elif kind == DRAW or kind == RECYCLE:
+            game.apply(move)
+            self.show(BOTTOM_FACE_DOWN_PILE)
+            self.show(BOTTOM_FACE_UP_PILE)
+        else:
+            source_index = game.pile_of[card]
+            depth = game.depth_of[card]
+            game.apply(move)
+            self.show(source_index, depth)
+            self.show(pile_index, game.depth_of[card])
+
+    def show(self, pile_index, depth=0):
+        """ Bring a pile's places up to date, from depth up """
+        pile = self.game.piles[pile_index]
+        places = self.places[pile_index]
+        face_up = self.game.face_up
+        for place_depth in range(depth, len(pile)):
+            code = pile[place_depth]
+            place = places[place_depth]
+            texture = self.faces[code] if face_up[code] else CARD_TEXTURES.back
+            if place.texture is not texture:
+                place.texture = texture
+            if place_depth >= self.shown[pile_index]:
+                place.scale = CARD_SCALE
+        for place_depth in range(len(pile), self.shown[pile_index]):
+            places[place_depth].scale = 0
+        self.shown[pile_index] = len(pile)
+
+    def sprites(self):
+        """ Every place, in drawing order """
+        return [place for places in self.places for place in places]
+
+
+class TableGrid(arcade.Window):
+    """ A window full of tables, each playing itself """
+
+    def __init__(self, table_count, start_seed=0, moves_per_frame=TABLE_MOVES_PER_FRAME, visible=True):
+        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, visible=visible)
+        self.background_color = arcade.color.AMAZON
+        self.moves_per_frame = moves_per_frame
+
+        # Lay the tables out full size, left to right from the top row down
+        CARD_TEXTURES.load()
+        faces = [CARD_TEXTURES.faces[suit, value] for suit in CARD_SUITS for value in CARD_VALUES]
+        self.columns, self.rows = grid_size(table_count)
+        self.tables = [Table(TableLayout((index % self.columns) * SCREEN_WIDTH,
+                                         (self.rows - 1 - index // self.columns) * SCREEN_HEIGHT), faces)
+                       for index in range(table_count)]
+
+        # Every table's mats in one list and card places in another, sharing the window's atlas
+        self.mats = arcade.SpriteList()
+        self.places = arcade.SpriteList()
+        self.places.preload_textures(CARD_TEXTURES.all())
+        for table in self.tables:
+            for pile_index in range(PILE_COUNT):
+                mat = arcade.SpriteSolidColor(MAT_WIDTH, MAT_HEIGHT, arcade.csscolor.DARK_OLIVE_GREEN)
+                mat.position = table.layout.pile_positions[pile_index]
+                self.mats.append(mat)
+            self.places.extend(table.sprites())
+
+        # Seeds are handed out in order, so the tables work up one ladder.
+        # The next seeds are always being planned, one per table, by workers
+        # that leave a core for the window.
+        self.planner = multiprocessing.Pool(max(1, (os.cpu_count() or 1) - 1))
+        self.next_seed = start_seed
+        self.plans = deque()
+        self.plan_ahead(len(self.tables))
+        # Tables waiting for their next deal, first finished first
+        self.waiting = deque(self.tables)
+
+        self.played = 0
+        self.won = 0
+        self.moves = 0
+        self.title_due = 0.0
+        self.started = time.perf_counter()
+
+        self.fit_view()
+
+    def plan_ahead(self, count):
+        """ Start planning the next count seeds of the ladder """
+        for _ in range(count):
+            self.plans.append((self.next_seed, self.planner.apply_async(plan_greedy, (self.next_seed,))))
+            self.next_seed += 1
+
+    def close(self):
+        self.planner.terminate()
+        super().close()
+
+    def fit_view(self):
+        """ Zoom out until the whole grid fits, keeping the tables' shape """
+        zoom = max(self.columns, self.rows)
+        arcade.set_viewport(0, SCREEN_WIDTH * zoom, 0, SCREEN_HEIGHT * zoom)
+
+    def on_resize(self, width, height):
+        super().on_resize(width, height)
+        self.fit_view()
+
+    def deal_waiting(self):
+        """ Deal the planned seeds, in ladder order, at the tables that have waited longest """
+        dealt = 0
+        while self.waiting and self.plans and self.plans[0][1].ready():
+            seed, plan = self.plans.popleft()
+            table = self.waiting.popleft()
+            table.deal(seed, *plan.get())
+            dealt += 1
+            if table.done:
+                # Nothing to play, so it's finished already
+                self.deal_done(table)
+        self.plan_ahead(dealt)
+
+    def deal_done(self, table):
+        """ Count a table's finished deal and queue it for its next one """
+        self.played += 1
+        self.won += table.status == WON
+        self.waiting.append(table)
+
+    def on_update(self, delta_time):
+        self.deal_waiting()
+
+        for table in self.tables:
+            if table.done:
+                continue
+            for _ in range(self.moves_per_frame):
+                table.play_next()
+                self.moves += 1
+                if table.done:
+                    self.deal_done(table)
+                    break
+
+        if time.perf_counter() >= self.title_due:
+            elapsed = time.perf_counter() - self.started
+            self.set_caption(f"{SCREEN_TITLE}: {len(self.tables)} tables, {self.won}/{self.played} won, "
+                             f"{self.moves / max(elapsed, 1e-9):.0f} moves/s")
+            self.title_due = time.perf_counter() + TITLE_INTERVAL
+
+    def on_draw(self):
+        self.clear()
+        self.mats.draw()
+        self.places.draw()
+
+
+def main():
+    """ Main function """
+    parser = argparse.ArgumentParser(description="Watch many tables of solitaire play themselves.")
+    parser.add_argument("--tables", type=int, default=16, help="how many tables to show")
+    parser.add_argument("--start", type=int, default=0, help="first deal number of the ladder")
+    parser.add_argument("--moves-per-frame", type=int, default=TABLE_MOVES_PER_FRAME,
+                        help="moves each table makes per frame")
+    args = parser.parse_args()
+
+    TableGrid(args.tables, args.start, args.moves_per_frame)
+    arcade.run()
+
+
+if __name__ == "__main__":
+    main()